@@ -0,0 +1,124 @@
+# coding=utf-8
+"""
+Benchmark script for the path-finding engines of PathSolver.
+Every engine is run on the exact same seeded game states, so the numbers can be compared directly.
+The states are made by letting a snake eat its way to a certain length, so the body is laid out like in a real game.
+Every solver gets one search before the timed one, so that the hierarchical engine has built its clusters,
+which a game only has to do once. Its paths can be a few steps longer than the others.
+Usage: python bench_script.py [map size] [number of states]
+
+It also measures where the pool of workers (see BaseSolver.start_pool) starts to pay off, by timing LookaheadSolver
+with and without it on a few map sizes. The size it finds is the min_cells that start_pool needs.
+Usage: python bench_script.py pool [number of workers] [number of states]
+"""
+import random
+import sys
+import time
+from collections import deque
+
+from snake.map import Map, Snake, Direc, Pos, PointType
+from snake.solver import PathSolver, LookaheadSolver
+
+ENGINES = ['shortest', 'astar', 'bidirectional', 'jps', 'hierarchical']
+
+
+def make_state(size, length, seed):
+    """
+    Grows a snake to a certain length by following the shortest path to each piece of food.
+    Food that can't be reached is moved somewhere else, so the head always has somewhere to go at the end.
+    :param size: The number of rows and columns, not counting the walls.
+    :param length: The length to grow the snake to.
+    :param seed: The random seed, so that the state is the same every time.
+    :return: The snake, with a piece of food on its map that it can reach.
+    """
+    random.seed(seed)
+    m = Map(size + 2, size + 2)
+    s = Snake(m, Direc.RIGHT, [Pos(1, 2), Pos(1, 1)], [PointType.HEAD_R, PointType.BODY_HOR])
+    solver = PathSolver(s)
+    while True:
+        path = deque()
+        for _ in range(100):
+            m.rm_food()
+            m.create_rand_food()
+            path = solver.shortest_path_to_food()
+            if path:
+                break
+        if not path or s.len() >= length:
+            return s
+        s.move_path(path)
+
+
+def bench(size, num_states):
+    """
+    Times every engine on the same states, and prints the total time and cells expanded.
+    :param size: The number of rows and columns, not counting the walls.
+    :param num_states: The number of states to try.
+    :return: None.
+    """
+    states = [make_state(size, 2 * size, seed) for seed in range(num_states)]
+    print('Map size: {}x{}, states: {}'.format(size, size, num_states))
+    for engine in ENGINES:
+        tot_time, tot_expanded, tot_len = 0.0, 0, 0
+        for s in states:
+            solver = PathSolver(s)
+            solver.path_to(s.tail(), engine)
+            random.seed(0)
+            start = time.perf_counter()
+            path = solver.path_to(s.map.food, engine)
+            tot_time += time.perf_counter() - start
+            tot_expanded += solver.expanded
+            tot_len += len(path)
+        print('{:>14}: {:8.2f} ms  expanded: {:8d}  path length: {}'.format(engine, 1000 * tot_time,
+                                                                             tot_expanded, tot_len))
+
+
+def _warm_up(snake, direc):
+    """
+    Does nothing, in a worker.
+    """
+    return direc
+
+
+def bench_pool(workers, num_states, sizes=(8, 12, 16, 20, 30)):
+    """
+    Times a tick of LookaheadSolver with and without the pool, on the same states, for every map size.
+    Each tick gets a fresh solver, so that neither side has the states in its transposition table already.
+    :param workers: The number of worker processes.
+    :param num_states: The number of states to try for each size.
+    :param sizes: The map sizes to try.
+    :return: None.
+    """
+    print('Workers: {}, states: {}'.format(workers, num_states))
+    crossover = None
+    for size in sizes:
+        states = [make_state(size, size, seed) for seed in range(num_states)]
+        times = []
+        for pooled in (False, True):
+            tot_time = 0.0
+            for s in states:
+                solver = LookaheadSolver(s)
+                if pooled:
+                    solver.start_pool(0, workers)
+                    solver.score_moves(_warm_up, [Direc.LEFT, Direc.RIGHT])  # Let the workers start up first.
+                start = time.perf_counter()
+                solver.next_direc()
+                tot_time += time.perf_counter() - start
+                solver.close_pool()
+            times.append(1000 * tot_time / num_states)
+        if times[1] >= times[0]:
+            crossover = None
+        elif crossover is None:
+            crossover = size
+        print('{:>4}x{:<4} serial: {:8.2f} ms  pool: {:8.2f} ms'.format(size, size, *times))
+    if crossover:
+        # The sizes don't count the walls (see make_state), and neither does min_cells, so it's just the area.
+        print('The pool pays off from {0}x{0} up (min_cells={1}).'.format(crossover, crossover ** 2))
+    else:
+        print('The pool doesn\'t pay off at any of these sizes.')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'pool':
+        bench_pool(int(sys.argv[2]) if len(sys.argv) > 2 else None, int(sys.argv[3]) if len(sys.argv) > 3 else 5)
+    else:
+        bench(int(sys.argv[1]) if len(sys.argv) > 1 else 30, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -3,10 +3,14 @@
 Main run script.
 Comment out GreedySolver to get a 100% success rate.
 Comment out HamiltonSolver to get a fun snake that's very greedy.
+Or use LookaheadSolver, which is greedy too, but looks before it leaps.
+RolloutSolver plays the game forward a bunch of times before every move. It needs NumPy.
 """
 from snake.game import GameConfig, Game
 
 conf = GameConfig()
 # conf.solver_name = 'HamiltonSolver'
 conf.solver_name = 'GreedySolver'
+# conf.solver_name = 'LookaheadSolver'
+# conf.solver_name = 'RolloutSolver'
 Game(conf).run()
@@ -7,7 +7,7 @@ import errno
 from snake.gui import GameWindow
 from snake.map import Direc, Pos, PointType, Map, Snake
 # noinspection PyUnresolvedReferences
-from snake.solver import HamiltonSolver, GreedySolver
+from snake.solver import HamiltonSolver, GreedySolver, LookaheadSolver, RolloutSolver
 
 
 class GameConfig:
@@ -30,6 +30,8 @@ class GameConfig:
         self.enable_AI = False
         self.solver_name = 'GreedySolver'
         # This isn't very important since the solver type is changed in the run_script.
+        self.solver_budget_ms = None
+        # How long the solver may think each tick, in milliseconds. None means as long as it likes.
 
         # Visuals #
         self.show_gui = True
@@ -234,7 +236,7 @@ class Game:
         if self.__pause or self.__episode_end():
             return
         if self.__conf.enable_AI:
-            self.__update_direc(self.__solver.next_direc())
+            self.__update_direc(self.__solver.next_direc(self.__conf.solver_budget_ms))
         if (self.__conf.show_gui and self.__snake.direc_next != Direc.NONE) or self.__conf.picture_logging:
             self.__write_logs()
         self.__snake.move()
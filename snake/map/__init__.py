@@ -6,3 +6,4 @@ from snake.map.pos import Pos
 from snake.map.point import PointType, Point
 from snake.map.map import Map
 from snake.map.snake import Snake
+from snake.map.bitboard import Bitboard
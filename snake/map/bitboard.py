@@ -0,0 +1,104 @@
+# coding=utf-8
+"""Definition of class Bitboard, a bitmask view of a map for quick reachability questions."""
+
+from snake.map.point import PointType
+
+_EMPTY = PointType.EMPTY.value
+_FOOD = PointType.FOOD.value
+
+
+class Bitboard:
+    """
+    A view of a map where every free cell (empty or food) is a single bit of one big Python integer.
+    Bit number idx belongs to the cell with id idx (see Map.idx_of).
+
+    Flood fills are done by shifting the whole set of reached cells at once:
+    a shift by 1 moves every cell left or right, and a shift by num_cols moves every cell up or down.
+    Masking that with the free cells gives the next frontier.
+    The border of the map is all walls, so nothing ever wraps around from one row to the next.
+
+    The bitboard listens to the map, so it stays in sync as the snake moves.
+    Call detach when you don't need it anymore, so that the map stops updating it.
+    """
+
+    def __init__(self, m):
+        """
+        :param m: The map to watch, of type Map.
+        """
+        self.__map = m
+        self.__free = 0
+        self.on_reset()
+        m.add_observer(self)
+
+    def detach(self):
+        """
+        Stops listening to the map. The bitboard won't be up to date after this.
+        :return: Void.
+        """
+        self.__map.remove_observer(self)
+
+    def on_reset(self):
+        """
+        Rebuilds the mask from scratch. Called by the map after it is reset.
+        :return: Void.
+        """
+        free = 0
+        for idx, c in enumerate(self.__map.cells):
+            if c == _EMPTY or c == _FOOD:
+                free |= 1 << idx
+        self.__free = free
+
+    def on_change(self, idx, old, new):
+        """
+        Flips the bit of a cell if it went from free to not free, or the other way around.
+        :param idx: The id of the cell that changed.
+        :param old: The old PointType value.
+        :param new: The new PointType value.
+        :return: Void.
+        """
+        if (old == _EMPTY or old == _FOOD) != (new == _EMPTY or new == _FOOD):
+            self.__free ^= 1 << idx
+
+    @property
+    def free_mask(self):
+        """
+        :return: The mask of free cells, of type Integer.
+        """
+        return self.__free
+
+    def reachable_mask(self, src, free=None):
+        """
+        Flood fills from src through the free cells.
+        src itself doesn't have to be free, so this works from the snake's head.
+        :param src: The starting position, of type Pos.
+        :param free: The mask of cells that can be walked on. Defaults to the free cells of the map.
+        :return: The mask of all the cells reached, src included, of type Integer.
+        """
+        if free is None:
+            free = self.__free
+        cols = self.__map.num_cols
+        reach = frontier = 1 << self.__map.idx_of(src)
+        while frontier:
+            grown = (frontier << 1 | frontier >> 1 | frontier << cols | frontier >> cols) & free
+            frontier = grown & ~reach
+            reach |= frontier
+        return reach
+
+    def region_size(self, src):
+        """
+        :param src: The starting position, of type Pos.
+        :return: The number of free cells that can be reached from src. src only counts if it is free itself.
+        """
+        reach = self.reachable_mask(src) & self.__free
+        return bin(reach).count('1')
+
+    def is_connected(self, a, b):
+        """
+        Checks if there is a path from a to b through free cells.
+        Neither a nor b has to be free, so this answers "can the head still reach the tail?".
+        :param a: A position of type Pos.
+        :param b: A position of type Pos.
+        :return: Boolean Value.
+        """
+        target = 1 << self.__map.idx_of(b)
+        return bool(self.reachable_mask(a, self.__free | target) & target)
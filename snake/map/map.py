@@ -1,9 +1,26 @@
 # coding=utf-8
 """ Definition of class Map."""
 import random
+import struct
+import sys
+from array import array
 
-from snake.map.point import Point, PointType
+from snake.map.direction import Direc
+from snake.map.point import Point, PointType, TYPE_OF
 from snake.map.pos import Pos
+from snake.map.zobrist import cell_keys, TYPE_CODE, NUM_TYPES
+
+_EMPTY = PointType.EMPTY.value
+_WALL = PointType.WALL.value
+_FOOD = PointType.FOOD.value
+
+_HEADER = struct.Struct('<4sBHHiQI')
+_MAGIC = b'SNKM'
+_VERSION = 1
+
+_templates = {}
+# Everything about an empty map (and the neighbour tables) only depends on its size,
+# so maps (and their copies) of the same size share them. This makes creating a map cheap.
 
 
 class Map:
@@ -20,8 +37,17 @@ class Map:
     These functions are used for pathfinding for Mr. Hamilton and the Greedy Snake. They ensure that the snake does not
     cross itself and that the snake dies when it's supposed to die.
     Food eating and creating is handled by the map as well. These functions are called by the snake.
+
+    Under the hood, the cells are stored in one flat bytearray, where the cell at (x, y) lives at index
+    x * num_cols + y and holds the value of its PointType. The Point objects returned by point() are just views
+    into that buffer. Hot loops (like the path-finders) can skip the views entirely and use the *_idx methods.
+    Those indices double as integer cell ids: neighbors[idx] holds the ids of the four adjacent cells,
+    in the same order as ADJ_DIRECS, so neighbors[idx][direc.value - 1] is the cell in direction direc.
     """
 
+    ADJ_DIRECS = (Direc.LEFT, Direc.UP, Direc.RIGHT, Direc.DOWN)
+    # The same order as Pos.all_adj, and as the neighbour ids in neighbors.
+
     def __init__(self, num_rows, num_cols):
         """
         :param num_rows: Integer of the number of rows, including walls. This is the x value.
@@ -34,7 +60,22 @@ class Map:
         self.__num_rows = num_rows
         self.__num_cols = num_cols
         self.__capacity = (num_rows - 2) * (num_cols - 2)
-        self.__content = [[Point() for _ in range(num_cols)] for _ in range(num_rows)]
+        if (num_rows, num_cols) not in _templates:
+            _templates[num_rows, num_cols] = Map.__build_template(num_rows, num_cols)
+        self.__blank, self.__blank_empty, self.__blank_slot, self.__blank_hash, self.__neighbors = \
+            _templates[num_rows, num_cols]
+        # The layout of an empty map. Resetting is just copying this over the cells.
+        self.__cells = bytearray(self.__blank)
+        self.__delta_direc = {-1: Direc.LEFT, -num_cols: Direc.UP, 1: Direc.RIGHT, num_cols: Direc.DOWN}
+        self.__keys = cell_keys(num_rows * num_cols)
+        self.__hash = self.__blank_hash
+        # The empty cells are kept in a list (in no particular order), and __slot tells us where each cell is
+        # in that list (or -1 if it isn't empty). That way, we can add or remove an empty cell in O(1),
+        # by swapping it with the last one in the list.
+        self.__empty = []
+        self.__slot = []
+        self.__num_food = 0
+        self.__observers = []
         self.reset()
 
     def reset(self):
@@ -45,26 +86,83 @@ class Map:
         :return: Void.
         """
         self.__food = None
-        for i in range(self.__num_rows):
-            for j in range(self.__num_cols):
-                if i == 0 or i == self.__num_rows - 1 or j == 0 or j == self.__num_cols - 1:
-                    self.__content[i][j].type = PointType.WALL
-                else:
-                    self.__content[i][j].type = PointType.EMPTY
+        self.__cells[:] = self.__blank
+        self.__empty = list(self.__blank_empty)
+        self.__slot = list(self.__blank_slot)
+        self.__num_food = 0
+        self.__hash = self.__blank_hash
+        for observer in self.__observers:
+            observer.on_reset()
 
     def copy(self):
         """
         This literally copies the map into another map. What do you expect?
         But seriously, it creates a new map object with the exact same point values but
         with different memory locations and ids.
-        :return: Void.
+        Since all the cells live in one buffer, this is a single buffer copy.
+        :return: The copy of the map.
         """
         map_copy = Map(self.__num_rows, self.__num_cols)
-        for i in range(self.__num_rows):
-            for j in range(self.__num_cols):
-                map_copy.__content[i][j].type = self.__content[i][j].type
+        map_copy.__cells[:] = self.__cells
+        map_copy.__empty = list(self.__empty)
+        map_copy.__slot = list(self.__slot)
+        map_copy.__num_food = self.__num_food
+        map_copy.__hash = self.__hash
+        map_copy.__food = None if self.__food is None else +self.__food
         return map_copy
 
+    def to_bytes(self):
+        """
+        Dumps the map into a compact blob, that from_bytes can turn back into the same map.
+        The layout is fixed, and everything is little-endian:
+            4 bytes     magic, b'SNKM'
+            uint8       layout version, currently 1
+            uint16      num_rows
+            uint16      num_cols
+            int32       id of the food, or -1 if there is no food
+            uint64      Zobrist hash
+            uint32      number of empty cells, n
+            num_rows * num_cols bytes   the PointType value of each cell, by cell id
+            n * uint32  ids of the empty cells, in the order used to pick random food
+        The order of the empty cells is kept so that random food comes out the same after restoring.
+        :return: The blob, of type bytes.
+        """
+        empty = array('I', self.__empty)
+        if sys.byteorder == 'big':
+            empty.byteswap()
+        food = -1 if self.__food is None else self.idx_of(self.__food)
+        return b''.join((_HEADER.pack(_MAGIC, _VERSION, self.__num_rows, self.__num_cols, food, self.__hash,
+                                      len(empty)),
+                         self.__cells,
+                         empty.tobytes()))
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        Rebuilds a map dumped by to_bytes.
+        :param data: The blob, of type bytes. Anything after the map is ignored.
+        :return: The map.
+        """
+        magic, version, num_rows, num_cols, food, zobrist, num_empty = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Not a map snapshot.')
+        m = Map(num_rows, num_cols)
+        start = _HEADER.size
+        end = start + num_rows * num_cols
+        m.__cells[:] = data[start:end]
+        empty = array('I')
+        empty.frombytes(data[end:end + 4 * num_empty])
+        if sys.byteorder == 'big':
+            empty.byteswap()
+        m.__empty = empty.tolist()
+        m.__slot = [-1] * (num_rows * num_cols)
+        for slot, idx in enumerate(m.__empty):
+            m.__slot[idx] = slot
+        m.__num_food = m.__cells.count(_FOOD)
+        m.__hash = zobrist
+        m.__food = None if food < 0 else m.pos_of(food)
+        return m
+
     def point(self, pos):
         """
         Returns a point on the map.
@@ -77,9 +175,135 @@ class Map:
         :param pos: An object of type Pos, which we use to get the point on the map.
         :return: A point in the map of type Point, whose type is an enum of PointType.
         """
-        return self.__content[pos.x][pos.y]
+        return Point(self, pos.x * self.__num_cols + pos.y)
         # See how much prettier it looks with pos.x and pos.y? Yay!
 
+    def idx_of(self, pos):
+        """
+        :param pos: An object of type Pos.
+        :return: The index of that position in the flat buffer of cells, of type Integer.
+        """
+        return pos.x * self.__num_cols + pos.y
+
+    def pos_of(self, idx):
+        """
+        The opposite of idx_of.
+        :param idx: The index of a cell in the flat buffer.
+        :return: The position of that cell, of type Pos.
+        """
+        return Pos(idx // self.__num_cols, idx % self.__num_cols)
+
+    def direc_between(self, idx, adj_idx):
+        """
+        The integer version of Pos.direction_to.
+        :param idx: The index of a cell.
+        :param adj_idx: The index of a cell next to it.
+        :return: The direction to go in to get from idx to adj_idx, of type Direc.
+        """
+        return self.__delta_direc.get(adj_idx - idx, Direc.NONE)
+
+    @staticmethod
+    def __build_template(num_rows, num_cols):
+        """
+        Works out everything about an empty map of a certain size.
+        Cells on the edge of the map are walls, so any neighbour that would fall off the map is just -1.
+        :param num_rows: The number of rows.
+        :param num_cols: The number of columns.
+        :return: The cells of an empty map, the list of empty cells, the table of their slots in that list,
+        its Zobrist hash, and the table of neighbours: one tuple of four neighbour ids (left, up, right, down)
+        for each cell.
+        """
+        wall_row = bytes([_WALL]) * num_cols
+        inner_row = bytes([_WALL]) + bytes([_EMPTY]) * (num_cols - 2) + bytes([_WALL])
+        blank = wall_row + inner_row * (num_rows - 2) + wall_row
+        blank_empty = [i for i, c in enumerate(blank) if c == _EMPTY]
+        blank_slot = [-1] * len(blank)
+        for slot, i in enumerate(blank_empty):
+            blank_slot[i] = slot
+        keys = cell_keys(num_rows * num_cols)
+        blank_hash = 0
+        for idx, c in enumerate(blank):
+            blank_hash ^= keys[idx * NUM_TYPES + TYPE_CODE[c]]
+        neighbors = []
+        for i in range(num_rows):
+            for j in range(num_cols):
+                idx = i * num_cols + j
+                neighbors.append((idx - 1 if j > 0 else -1,
+                                  idx - num_cols if i > 0 else -1,
+                                  idx + 1 if j < num_cols - 1 else -1,
+                                  idx + num_cols if i < num_rows - 1 else -1))
+        return blank, tuple(blank_empty), tuple(blank_slot), blank_hash, tuple(neighbors)
+
+    def type_at_idx(self, idx):
+        """
+        Fast path of point(pos).type.
+        :param idx: The index of a cell in the flat buffer.
+        :return: The type of the cell, of enum PointType.
+        """
+        return TYPE_OF[self.__cells[idx]]
+
+    def set_type_idx(self, idx, t):
+        """
+        Fast path of point(pos).type = t.
+        Every change to a cell goes through here, so this is also where the index of empty cells
+        and the Zobrist hash are kept up to date.
+        :param idx: The index of a cell in the flat buffer.
+        :param t: The new type of the cell, of enum PointType.
+        :return: Void.
+        """
+        old, new = self.__cells[idx], t.value
+        if old == new:
+            return
+        self.__cells[idx] = new
+        base = idx * NUM_TYPES
+        self.__hash ^= self.__keys[base + TYPE_CODE[old]] ^ self.__keys[base + TYPE_CODE[new]]
+        if old == _EMPTY:
+            # Swap the cell with the last empty cell, then pop it off.
+            slot, last = self.__slot[idx], self.__empty[-1]
+            self.__empty[slot] = last
+            self.__slot[last] = slot
+            self.__empty.pop()
+            self.__slot[idx] = -1
+        elif old == _FOOD:
+            self.__num_food -= 1
+        if new == _EMPTY:
+            self.__slot[idx] = len(self.__empty)
+            self.__empty.append(idx)
+        elif new == _FOOD:
+            self.__num_food += 1
+        for observer in self.__observers:
+            observer.on_change(idx, old, new)
+
+    def add_observer(self, observer):
+        """
+        Registers an object that wants to hear about every change to the cells, like a Bitboard.
+        The observer needs two methods: on_change(idx, old, new), which gets the id of the cell and the
+        old and new PointType values, and on_reset(), which is called after the map has been reset.
+        Copies of the map don't take their observers with them.
+        :param observer: The observer.
+        :return: Void.
+        """
+        self.__observers.append(observer)
+
+    def remove_observer(self, observer):
+        """
+        Stops sending changes to an observer.
+        :param observer: An observer that was added with add_observer.
+        :return: Void.
+        """
+        self.__observers.remove(observer)
+
+    def is_safe_idx(self, idx):
+        """
+        Fast path of is_safe(pos).
+        There's no need to check the boundaries, because the border of the map is all walls,
+        so every neighbour of an inside cell is still in the buffer.
+        :param idx: The index of a cell in the flat buffer.
+        :return: Boolean Value.
+        """
+        c = self.__cells[idx]
+        return c == _EMPTY or c == _FOOD
+
     def is_inside(self, pos):
         """
         Check if a point is inside the map boundaries.
@@ -96,7 +320,7 @@ class Map:
         :param pos: An object of type Pos, which we use to get the point on the map.
         :return: Boolean Value.
         """
-        return self.is_inside(pos) and self.point(pos).type == PointType.EMPTY
+        return self.is_inside(pos) and self.__cells[pos.x * self.__num_cols + pos.y] == _EMPTY
 
     def is_safe(self, pos):
         """
@@ -105,24 +329,24 @@ class Map:
         :param pos: An object of type pos, which we use to get the point on the map.
         :return: Boolean Value.
         """
-        return self.is_inside(pos) and (self.point(pos).type == PointType.EMPTY or
-                                        self.point(pos).type == PointType.FOOD)
+        return self.is_inside(pos) and self.is_safe_idx(pos.x * self.__num_cols + pos.y)
 
     def is_full(self):
         """
         Check if the map has been filled with the snake bodies. If it has, hooray!
         It's a success!
-        This is done by checking if every point on the map is part of the snake, by virtue of the PointType Enum.
+        This is done by checking that no point on the map is empty or food.
+        Both of these are counted as the cells change, so there's no need to look at the map at all.
         :return: Boolean Value.
         """
-        for i in range(1, self.__num_rows - 1):
-            for j in range(1, self.__num_cols - 1):
-                t = self.__content[i][j].type
-                if t.value < PointType.HEAD_L.value:
-                    return False
-                    # We have the empty, wall, and food set to sub-100,
-                    # so as long as it is sub 100, it's not snake!
-        return True
+        return not self.__empty and not self.__num_food
+
+    def has_empty(self):
+        """
+        Checks if there is any empty point on the map.
+        :return: Boolean Value.
+        """
+        return bool(self.__empty)
 
     def has_food(self):
         """
@@ -158,21 +382,14 @@ class Map:
     def create_rand_food(self):
         """
         Creates a random piece of food at one of the empty spots.
-        This is done by getting all the possible places where the food could be placed,
-        then using random.choice to randomly choose a position.
+        This is done by using random.choice on the list of empty cells, which is always up to date.
         :return: None if there are no empty spots else the food in question.
         """
-        possible_food_positions = []
-        for i in range(self.__num_rows):
-            for j in range(self.__num_cols):
-                t = self.__content[i][j].type
-                if t == PointType.EMPTY:
-                    possible_food_positions.append(Pos(i, j))
-                elif t == PointType.FOOD:
-                    # Too much food! It'll make the snake bloat.
-                    return None
-        if possible_food_positions:
-            return self.create_food(random.choice(possible_food_positions))
+        if self.__num_food:
+            # Too much food! It'll make the snake bloat.
+            return None
+        if self.__empty:
+            return self.create_food(self.pos_of(random.choice(self.__empty)))
         else:
             return None
 
@@ -201,6 +418,37 @@ class Map:
         """
         return self.__capacity
 
+    @property
+    def neighbors(self):
+        """
+        :return: The table of neighbour ids. See the docstring of the class.
+        """
+        return self.__neighbors
+
+    @property
+    def num_empty(self):
+        """
+        :return: The number of empty points on the map.
+        """
+        return len(self.__empty)
+
+    @property
+    def zobrist(self):
+        """
+        The Zobrist hash of every cell on the map. The food and the direction of the head are both part of the
+        point types, so two maps with the same hash almost certainly look exactly the same.
+        :return: A 64-bit hash of the map, of type Integer.
+        """
+        return self.__hash
+
+    @property
+    def cells(self):
+        """
+        The raw buffer of cells. Read it as much as you want, but change cells through set_type_idx.
+        :return: The bytearray of PointType values, indexed by x * num_cols + y.
+        """
+        return self.__cells
+
     @property
     def food(self):
         """
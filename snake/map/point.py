@@ -30,16 +30,31 @@ class PointType(Enum):
     BODY_VER = 109
 
 
+TYPE_OF = [None] * 256
+# Lookup table from the raw byte stored in the map buffer to its PointType.
+# Indexing a list is a lot cheaper than calling PointType(value) every time.
+for _t in PointType:
+    TYPE_OF[_t.value] = _t
+
+
 class Point:
     """
     Point on the game map.
     This is the basis for practically everything, along with pos, since every Point on the map can be accessed by Pos.
+
+    A point handed out by a map is only a thin view over the map's flat buffer,
+    so reading or writing its type goes straight to the map.
+    A point created on its own just keeps its type to itself.
     """
 
-    def __init__(self):
+    def __init__(self, m=None, idx=0):
         """
         Set the default PointType to empty.
+        :param m: The map that this point is a view of, or None for a standalone point.
+        :param idx: The index of the cell in the map's buffer.
         """
+        self.__map = m
+        self.__idx = idx
         self.__type = PointType.EMPTY
 
     @property
@@ -47,6 +62,8 @@ class Point:
         """
         :return: The type of the point. This is an PointType of class Enum.
         """
+        if self.__map is not None:
+            return self.__map.type_at_idx(self.__idx)
         return self.__type
 
     @type.setter
@@ -56,4 +73,7 @@ class Point:
         pretty means that when we call it, we can get the property, but we can use the
         same function to set the value.
         """
-        self.__type = val
+        if self.__map is not None:
+            self.__map.set_type_idx(self.__idx, val)
+        else:
+            self.__type = val
@@ -1,16 +1,54 @@
 # coding=utf-8
 """Definition of class Snake. He will become the all-powerful."""
 import random
-from collections import deque
+import struct
+import sys
+from array import array
 
 from snake.map.direction import Direc
+from snake.map.map import Map
 from snake.map.point import PointType
 from snake.map.pos import Pos
+from snake.map.zobrist import DIREC_KEYS
+
+_HEADER = struct.Struct('<4sBBBBIIB')
+_RNG = struct.Struct('<B625IBd')
+_MAGIC = b'SNKS'
+_VERSION = 1
+
+
+class _Bodies:
+    """
+    A read-only view of the snake's body as positions, from the head to the tail.
+    """
+
+    def __init__(self, snake):
+        self.__snake = snake
+
+    def __len__(self):
+        return self.__snake.len()
+
+    def __getitem__(self, i):
+        snake = self.__snake
+        if i < 0:
+            i += snake.len()
+        if not 0 <= i < snake.len():
+            raise IndexError('body index out of range')
+        return snake.map.pos_of(snake.body_idx(i))
+
+    def __iter__(self):
+        for i in range(self.__snake.len()):
+            yield self[i]
 
 
 class Snake:
     """
     Definitions for snake object. This is the ancestor of all snakes.
+
+    The body is kept in a ring buffer of cell ids (see Map.idx_of), with the head at __start.
+    On top of that, __entered remembers the step at which the head entered each cell.
+    The segment in a cell is always steps - entered cells away from the head,
+    so we can tell when any part of the body will be gone without walking the body.
     """
 
     def __init__(self, m, init_direc=None, init_bodies=None, init_types=None):
@@ -33,8 +71,8 @@ class Snake:
         First, if an initial direction has not been given, the snake is initiated at a random position.
         It is also given a random init_direc
         Second, the snake is reset and its direction is set to init_direc.
-        Its deque of bodies are also initiated. It is a deque because this allows for easy popping and appending
-        on both sides of the list, which is necessary for creating new heads and removing old tails. In with the new,
+        Its ring of bodies is also initiated. It is a ring buffer because this allows for easy popping and appending
+        on both sides, which is necessary for creating new heads and removing old tails. In with the new,
         out with the old.
         Finally, the PointTypes are transferred to the map, ready to be drawn.
         :param reset_map: This decides if the map is reset to be completely empty as well.
@@ -68,7 +106,16 @@ class Snake:
         self.__dead = False
         self.__direc = self.__init_direc
         self.__direc_next = Direc.NONE
-        self.__bodies = deque(self.__init_bodies)
+        num_cells = self.__map.num_rows * self.__map.num_cols
+        # The snake can never be longer than the map, so it never runs out of room.
+        self.__ring = array('i', [0]) * num_cells
+        self.__entered = array('i', [0]) * num_cells
+        self.__start = 0
+        self.__len = len(self.__init_bodies)
+        for i, pos in enumerate(self.__init_bodies):
+            idx = self.__map.idx_of(pos)
+            self.__ring[i] = idx
+            self.__entered[idx] = -i
 
         if reset_map:
             self.__map.reset()
@@ -90,9 +137,83 @@ class Snake:
         s_copy.__dead = self.__dead
         s_copy.__direc = self.__direc
         s_copy.__direc_next = self.__direc_next
-        s_copy.__bodies = deque(self.__bodies)
+        s_copy.__ring = array('i', self.__ring)
+        s_copy.__entered = array('i', self.__entered)
+        s_copy.__start = self.__start
+        s_copy.__len = self.__len
         return s_copy, m_copy
 
+    def to_bytes(self, with_rng=True):
+        """
+        Dumps the snake, its map, and optionally the state of the random module, into a compact blob.
+        from_bytes turns it back into a snake in one go, without replaying any moves.
+        The layout is fixed, and everything is little-endian:
+            4 bytes     magic, b'SNKS'
+            uint8       layout version, currently 1
+            uint8       direc, as the value of the Direc
+            uint8       direc_next, as the value of the Direc
+            uint8       1 if the snake is dead, else 0
+            uint32      steps
+            uint32      length, n
+            uint8       1 if the state of the random module follows, else 0
+            n * uint32  cell ids of the body, from the head to the tail
+            (only if the flag above is 1)
+                uint8       version of the random state
+                625 uint32  the Mersenne Twister state
+                uint8       1 if there is a saved gauss value, else 0
+                float64     the saved gauss value, or 0
+            the rest    the map, as laid out in Map.to_bytes
+        :param with_rng: Whether to save the state of the random module as well.
+        :return: The blob, of type bytes.
+        """
+        body = array('I', [self.body_idx(i) for i in range(self.__len)])
+        if sys.byteorder == 'big':
+            body.byteswap()
+        parts = [_HEADER.pack(_MAGIC, _VERSION, self.__direc.value, self.__direc_next.value, self.__dead,
+                              self.__steps, self.__len, with_rng),
+                 body.tobytes()]
+        if with_rng:
+            version, state, gauss = random.getstate()
+            parts.append(_RNG.pack(version, *state, gauss is not None, gauss or 0.0))
+        parts.append(self.__map.to_bytes())
+        return b''.join(parts)
+
+    @staticmethod
+    def from_bytes(data, restore_rng=False):
+        """
+        Rebuilds a snake and its map dumped by to_bytes.
+        :param data: The blob, of type bytes.
+        :param restore_rng: Whether to put the saved state back into the random module, if there is one.
+        This is off by default, since it changes the random numbers for everyone.
+        :return: Snake, Map, just like copy.
+        """
+        data = memoryview(data)
+        magic, version, direc, direc_next, dead, steps, length, with_rng = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Not a snake snapshot.')
+        offset = _HEADER.size
+        body = array('I')
+        body.frombytes(data[offset:offset + 4 * length])
+        if sys.byteorder == 'big':
+            body.byteswap()
+        offset += 4 * length
+        if with_rng:
+            rng = _RNG.unpack_from(data, offset)
+            offset += _RNG.size
+            if restore_rng:
+                random.setstate((rng[0], tuple(rng[1:626]), rng[627] if rng[626] else None))
+        m = Map.from_bytes(data[offset:])
+        s = Snake(m, Direc.NONE, [], [])
+        s.__steps = steps
+        s.__dead = bool(dead)
+        s.__direc = Direc(direc)
+        s.__direc_next = Direc(direc_next)
+        s.__len = length
+        s.__ring[:length] = array('i', body)
+        for i, idx in enumerate(body):
+            s.__entered[idx] = steps - i
+        return s, m
+
     @property
     def map(self):
         """
@@ -139,27 +260,57 @@ class Snake:
     @property
     def bodies(self):
         """
-        :return: The body of the snake. A list with contents Pos.
+        :return: The body of the snake. A read-only sequence with contents Pos, from the head to the tail.
+        """
+        return _Bodies(self)
+
+    @property
+    def zobrist(self):
+        """
+        The Zobrist hash of the game state: the map (which covers the body, the head and the food),
+        plus the direction the snake is going in. It is updated as the snake moves, so this costs nothing.
+        :return: A 64-bit hash of the state, of type Integer.
         """
-        return self.__bodies
+        return self.__map.zobrist ^ DIREC_KEYS[self.__direc]
 
     def len(self):
         """
         :return: The length of the snake. Integer presumably. Can we have a 2.5 length snake?
         """
-        return len(self.__bodies)
+        return self.__len
+
+    def body_idx(self, i):
+        """
+        :param i: The index of a body part, counting from 0 at the head.
+        :return: The cell id of that body part.
+        """
+        return self.__ring[(self.__start + i) % len(self.__ring)]
 
     def head(self):
         """
         :return: The head of the snake, as an object of type Pos.
         """
-        return None if not self.__bodies else self.__bodies[0]
+        return None if not self.__len else self.__map.pos_of(self.__ring[self.__start])
 
     def tail(self):
         """
         :return: The tail of the snake, as an object of type Pos.
         """
-        return None if not self.__bodies else self.__bodies[-1]
+        return None if not self.__len else self.__map.pos_of(self.body_idx(self.__len - 1))
+
+    def steps_until_vacated(self, pos):
+        """
+        Finds out how many more moves it takes until a cell is no longer part of the snake,
+        assuming that the snake doesn't eat anything on the way. The tail is gone after 1 move,
+        the head after len() moves.
+        :param pos: A position on the map of type Pos.
+        :return: The number of moves, of type Integer. 0 if the cell isn't part of the snake at all.
+        """
+        idx = self.__map.idx_of(pos)
+        i = self.__steps - self.__entered[idx]
+        if 0 <= i < self.__len and self.body_idx(i) == idx:
+            return self.__len - i
+        return 0
 
     def move_path(self, path):
         """
@@ -176,32 +327,86 @@ class Snake:
         If there is no new direction to move in, then the snake follows its old direction.
         :return: Void.
         """
+        self.apply(new_direc)
+
+    def apply(self, new_direc=None):
+        """
+        Moves the snake just like move, but also returns an undo record,
+        so that the move can be taken back with undo. This lets the solvers simulate moves on the real snake
+        instead of copying the whole snake and map.
+        The record is a tuple of (direc, direc_next, steps, dead, old head type,
+        new head id, new head type before, step the new head cell was entered before, tail id, tail type, food),
+        all taken from before the move. The new head id is -1 if the snake didn't move at all,
+        and the tail id is -1 if the snake ate instead of losing its tail.
+        :param new_direc: The new direction to move in.
+        :return: The undo record, of type tuple.
+        """
+        direc_next = self.__direc_next
         if new_direc is not None:
             self.__direc_next = new_direc
         if self.__dead or self.__direc_next == Direc.NONE or self.map.is_full():
-            return
+            return self.__direc, direc_next, self.__steps, self.__dead, None, -1, None, 0, -1, None, None
+        m = self.__map
+        head_idx = self.__ring[self.__start]
         old_head_type, new_head_type = self.__new_types()
-        self.__map.point(self.head()).type = old_head_type
-        new_head = self.head().adj(self.__direc_next)
-        self.__bodies.appendleft(new_head)
-        if not self.__map.is_safe(new_head):
+        record_head_type = m.type_at_idx(head_idx)
+        m.set_type_idx(head_idx, old_head_type)
+        new_head_idx = m.neighbors[head_idx][self.__direc_next.value - 1]
+        record_new_head_type = m.type_at_idx(new_head_idx)
+        record_entered = self.__entered[new_head_idx]
+        record_dead = self.__dead
+        self.__start = (self.__start - 1) % len(self.__ring)
+        self.__ring[self.__start] = new_head_idx
+        self.__len += 1
+        self.__entered[new_head_idx] = self.__steps + 1
+        if not m.is_safe_idx(new_head_idx):
             self.__dead = True
-        if self.__map.point(new_head).type == PointType.FOOD:
-            self.__map.rm_food()
+        tail_idx, tail_type, food = -1, None, None
+        if record_new_head_type == PointType.FOOD:
+            food = m.food
+            m.rm_food()
         else:
+            tail_idx = self.body_idx(self.__len - 1)
+            tail_type = m.type_at_idx(tail_idx)
             self.__rm_tail()
-        self.__map.point(new_head).type = new_head_type
+        m.set_type_idx(new_head_idx, new_head_type)
+        record = (self.__direc, direc_next, self.__steps, record_dead, record_head_type,
+                  new_head_idx, record_new_head_type, record_entered, tail_idx, tail_type, food)
         self.__direc = self.__direc_next
         self.__steps += 1
+        return record
+
+    def undo(self, record):
+        """
+        Takes back a move made by apply. Moves must be undone in the reverse order that they were applied.
+        :param record: The undo record returned by apply.
+        :return: Void.
+        """
+        direc, direc_next, steps, dead, head_type, new_head_idx, new_head_type, entered, tail_idx, tail_type, food = \
+            record
+        self.__direc, self.__direc_next, self.__steps, self.__dead = direc, direc_next, steps, dead
+        if new_head_idx < 0:
+            return
+        m = self.__map
+        m.set_type_idx(new_head_idx, new_head_type)
+        self.__entered[new_head_idx] = entered
+        if tail_idx >= 0:
+            self.__len += 1
+            m.set_type_idx(tail_idx, tail_type)
+        elif food is not None:
+            m.create_food(food)
+        self.__start = (self.__start + 1) % len(self.__ring)
+        self.__len -= 1
+        m.set_type_idx(self.__ring[self.__start], head_type)
 
     def __rm_tail(self):
         """
         This removes the tail of the snake by setting the point to be PointType Empty,
-        and popping the tail of the snake from the list of bodies.
+        and dropping the tail of the snake from the ring of bodies.
         :return: Void.
         """
-        self.__map.point(self.tail()).type = PointType.EMPTY
-        self.__bodies.pop()
+        self.__map.set_type_idx(self.body_idx(self.__len - 1), PointType.EMPTY)
+        self.__len -= 1
 
     def __new_types(self):
         """
@@ -238,4 +443,8 @@ class Snake:
         elif (self.__direc == Direc.RIGHT and self.__direc_next == Direc.DOWN) or \
                 (self.__direc == Direc.UP and self.__direc_next == Direc.LEFT):
             old_head_type = PointType.BODY_DL
+        if old_head_type is None:
+            # Turning right around, into the neck. The snake is about to die, but the old head still needs a picture.
+            horizontal = self.__direc_next == Direc.LEFT or self.__direc_next == Direc.RIGHT
+            old_head_type = PointType.BODY_HOR if horizontal else PointType.BODY_VER
         return old_head_type, new_head_type
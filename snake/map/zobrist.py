@@ -0,0 +1,34 @@
+# coding=utf-8
+"""
+Random keys for Zobrist hashing of game states.
+Each (cell, point type) pair and each direction gets its own random 64-bit key,
+and a state is hashed by XOR-ing together the keys of everything in it.
+Changing one cell is then just two more XORs: one to take the old key out, and one to put the new key in.
+"""
+import random
+
+from snake.map.direction import Direc
+from snake.map.point import PointType
+
+TYPE_CODE = [0] * 256
+# Turns a PointType value into a small number from 0 to NUM_TYPES - 1.
+for _code, _t in enumerate(PointType):
+    TYPE_CODE[_t.value] = _code
+NUM_TYPES = len(PointType)
+
+DIREC_KEYS = {direc: random.Random(direc.value).getrandbits(64) for direc in Direc}
+# The keys come from private generators with fixed seeds, so that they are the same in every run,
+# and so that making keys never disturbs the game's own random numbers.
+
+_cell_keys = {}
+
+
+def cell_keys(num_cells):
+    """
+    :param num_cells: The number of cells in the map.
+    :return: A list of keys, where the key of cell idx with type t is at idx * NUM_TYPES + TYPE_CODE[t.value].
+    """
+    if num_cells not in _cell_keys:
+        rand = random.Random(num_cells)
+        _cell_keys[num_cells] = [rand.getrandbits(64) for _ in range(num_cells * NUM_TYPES)]
+    return _cell_keys[num_cells]
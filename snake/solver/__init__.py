@@ -1,6 +1,11 @@
 # coding=utf-8
 """AI solvers package."""
 
+from snake.solver.cache import TranspositionCache
+from snake.solver.hierarchy import ClusterGraph
 from snake.solver.path import PathSolver
+from snake.solver.incremental import IncrementalDistanceField
 from snake.solver.greedy import GreedySolver
 from snake.solver.hamilton import HamiltonSolver
+from snake.solver.lookahead import LookaheadSolver
+from snake.solver.rollout import RolloutSolver
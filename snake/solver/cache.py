@@ -0,0 +1,90 @@
+# coding=utf-8
+"""
+Definitions for TranspositionCache, a bounded memo of results keyed by game state.
+The solvers use the Zobrist hash of the snake (see Snake.zobrist) as the key,
+so that a state they have already seen doesn't have to be searched again.
+"""
+import sys
+from collections import OrderedDict
+
+_ENTRY_OVERHEAD = 100
+# Rough number of bytes that the OrderedDict itself spends on each entry, on top of the key and the value.
+
+
+class TranspositionCache:
+    """
+    A least-recently-used cache with a cap on memory.
+    Every entry is charged the size of its key and value plus a bit of overhead.
+    Once the total goes over the cap, the entries that were used the longest time ago are thrown out.
+    """
+
+    def __init__(self, max_bytes=1 << 20):
+        """
+        :param max_bytes: The memory cap, in bytes. 1 MiB by default.
+        """
+        if max_bytes <= 0:
+            raise ValueError('\'max_bytes\' must be positive.')
+        self.__max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        """
+        Looks up a state, and marks it as recently used.
+        :param key: The key of the state. Usually a Zobrist hash.
+        :param default: What to return if the state isn't in the cache.
+        :return: The stored value, or default.
+        """
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores the value for a state, throwing out old entries if the cache is over its cap.
+        :param key: The key of the state. Usually a Zobrist hash.
+        :param value: Whatever the solver wants to remember about the state.
+        :return: Void.
+        """
+        if key in self.__entries:
+            self.__bytes -= self.__entries.pop(key)[1]
+        size = sys.getsizeof(key) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+        self.__entries[key] = (value, size)
+        self.__bytes += size
+        while self.__bytes > self.__max_bytes and self.__entries:
+            _, (_, old_size) = self.__entries.popitem(last=False)
+            self.__bytes -= old_size
+
+    def clear(self):
+        """
+        Throws out every entry.
+        :return: Void.
+        """
+        self.__entries.clear()
+        self.__bytes = 0
+
+    @property
+    def memory(self):
+        """
+        :return: The estimated number of bytes used by the entries.
+        """
+        return self.__bytes
+
+    @property
+    def max_bytes(self):
+        """
+        :return: The memory cap, in bytes.
+        """
+        return self.__max_bytes
@@ -3,71 +3,246 @@
 Definitions for GreedySolver.
 This snake tries to get to the food whenever possible. There are 5 steps to this.
 Step 1:     Get the shortest path to the food using BFS search. If that path exists, move to step 2.
-            Otherwise, move to step 4.
-Step 2:     Simulate a movement to that food. If it fills up the map, return that path. Otherwise, move to step 3.
-Step 3:     After that simulated snake has "eaten" the food, calculate the longest path from the head to the tail.
-            If the head can get to the tail in the simulated setting, then start moving along that path. Otherwise,
-            move to Step 4.
+            Otherwise, move to step 4. The same BFS finds the shortest path to the tail too, for step 4.
+Step 2:     Simulate a movement to that food (and undo it afterwards). If it fills up the map, return that path.
+            Otherwise, move to step 3.
+Step 3:     After that simulated snake has "eaten" the food, check if the head can still get to the tail.
+            There's no need for the actual path here, just a yes or no. If the head can get to the tail in the
+            simulated setting, then start moving along the path to the food. Otherwise, move to Step 4.
 Step 4:     This step is gone to if there is no path from the head to the food or if there is no path from the head
             to the tail after eating the food. In this case, we calculate the longest path from the head to the tail.
             This ensures that we begin making a full loop, and reevaluating to the food whenever it is available.
             If we can't even get to the tail, we're in some deep, deep trouble. To Step 5 we go!
 Step 5:     At this point, we can only hope for miracles. Do you want to know what our greedy snake does? It RUNS AWAY!
-            No, like literally, it chooses the path that is the furthest away from the snake, and goes that way.
+            No, like literally, it chooses the path that is the furthest away from the food, and goes that way.
+            It does look before it leaps, though. It goes for the move that leaves it the most room (up to its own
+            length, which is all the room it needs). Only if there's a tie does the distance from the food decide.
 """
-from snake.map import Pos
-from snake.solver import PathSolver
+from collections import deque
+
+from snake.map import Direc
+from snake.solver import PathSolver, TranspositionCache, IncrementalDistanceField
 from snake.solver.base import BaseSolver
 
 
 class GreedySolver(BaseSolver):
     """    A greedy little snake that only seeks to eat food. smh.    """
 
-    def __init__(self, snake):
+    def __init__(self, snake, cache_bytes=0, food_path_type='shortest', incremental=False, commit_plans=True):
+        """
+        :param snake: The snake to steer.
+        :param cache_bytes: The memory cap of the transposition cache, in bytes.
+        If it is 0, then there is no cache, and every decision is worked out from scratch.
+        :param food_path_type: How to find the path to the food. See PathSolver.
+        :param incremental: Whether to keep an IncrementalDistanceField to the food for step 5,
+        instead of spreading out a whole new distance field every time.
+        :param commit_plans: Whether to stick to a path once it's been worked out, instead of working everything
+        out again every tick. See next_direc.
+        """
         super().__init__(snake)
-        self.__path_solver = PathSolver(snake)
+        self.__path_solver = PathSolver(snake, food_path_type)
+        self.__cache = TranspositionCache(cache_bytes) if cache_bytes else None
+        self.__field = IncrementalDistanceField(snake.map) if incremental else None
+        self.__tail_path = None  # The shortest path to the tail, if step 1 found it along the way.
+        self.__food_path = None  # The path to the food, if steps 1 to 3 just found it safe.
+        self.__food_cut = False  # Whether the time ran out while walking along the path to the food.
+        self.__commit_plans = commit_plans
+        self.__plan = deque()  # The rest of the path the snake is committed to.
+        self.__plan_head = None  # Where the head should be if the snake is still following the plan.
+        self.__plan_food = None  # The food that was there when the plan was made.
+
+    @property
+    def cache(self):
+        """
+        :return: The transposition cache, or None.
+        """
+        return self.__cache
 
-    def next_direc(self):
+    def next_direc(self, budget_ms=None):
         """
         Get the next direction to move in.
+        A path to the food that steps 1 to 3 found safe stays safe all the way to the food, since nothing gets in
+        the way that wasn't there in the simulation. Likewise, the path to the tail from step 4 only goes over free
+        cells and the tail, which will have moved on by the time the head gets there. So once a path is found,
+        the snake just follows it, one direction a tick. The plan is dropped if the food changes, if the head isn't
+        where the plan left it, or if the next cell isn't free.
+        With a budget, the steps are the phases of the tick: food (steps 1 to 3), tail (step 4) and escape (step 5).
+        Once the time is up, whatever is left is done the quick way: the shortest path to the tail instead of the
+        longest if step 1 happened to find it, and otherwise any safe move for the escape.
+        :param budget_ms: How many milliseconds this may take. None means as long as it takes.
         :return: A direction of type Direc.
         """
-        # Clone the snake.
-        s_copy, m_copy = self.snake.copy()
-        # Step 1: Get the path to the food. If path 1 exists, move to step 2.
-        # Otherwise, move to step 4.
-        self.__path_solver.snake = self.snake  # That's my snake you're looking at!
-        path_to_food = self.__path_solver.shortest_path_to_food()
-        if path_to_food:
-            # Step 2: Make a virtual snake to eat the food along the path.
-            s_copy.move_path(path_to_food)
-            if m_copy.is_full():
-                return path_to_food[0]
-            # Step 3: Calculate the longest path from head to tail after eating food.
-            # If that longest path exists, then move along that path.
-            # Otherwise, go to step 4.
-            self.__path_solver.snake = s_copy
-            path_to_tail = self.__path_solver.longest_path_to_tail()
-            if len(path_to_tail) > 1:
-                return path_to_food[0]
+        self.start_tick(budget_ms)
+        direc = self.__planned_direc()
+        if direc == Direc.NONE:
+            self.__tail_path = self.__food_path = None
+            direc = self.__food_direc()
+            if direc == Direc.NONE:
+                direc = self.__tail_direc()
+            if direc == Direc.NONE:
+                direc = self.__escape_direc()
+        self.end_tick()
+        return direc
 
-        # Step 4: Calculate the longest path from head to tail.
-        # Remember, there is no path to the food right now that will guarantee our survival.
-        # Therefore, we do one full loop, and then check again.
-        # If that path exists, then move along that path.
-        # Else, move to step 5.
-        self.__path_solver.snake = self.snake
-        path_to_tail = self.__path_solver.longest_path_to_tail()
+    def __tail_direc(self):
+        """
+        Step 4: Calculate the longest path from head to tail.
+        Remember, there is no path to the food right now that will guarantee our survival.
+        Therefore, we do one full loop, and then check again.
+        If that path exists, then move along that path.
+        Else, move to step 5.
+        If step 1 already found the shortest path to the tail, then it only needs pushing out.
+        :return: The direction along the path to the tail, or Direc.NONE.
+        """
+        if not self.time_left():
+            self.report('tail', False)
+            # No time to push anything out, but the shortest path to the tail is better than nothing.
+            if self.__tail_path is not None and len(self.__tail_path) > 1:
+                return self.__tail_path[0]
+            return Direc.NONE
+        self.__path_solver.deadline = self.deadline
+        # If the time runs out halfway, the path is only pushed out partway, but it still gets to the tail.
+        path_to_tail = self.__path_solver.longest_path_to_tail(self.__tail_path)
+        self.report('tail', not self.__path_solver.timed_out)
         if len(path_to_tail) > 1:
+            self.__make_plan(path_to_tail)
             return path_to_tail[0]
+        return Direc.NONE
 
-        # Step 5: RUN AWAY! No, seriously, get as far away as you can from the food.
+    def __escape_direc(self):
+        """
+        Step 5: RUN AWAY! No, seriously, get as far away as you can from the food.
+        The distances come from one distance field spread out from the food,
+        so they go around the snake's body instead of straight through it.
+        Anything the food can't reach at all is as far away as it gets.
+        :return: The direction to run away in.
+        """
         head = self.snake.head()
+        moves = [adj for adj in head.all_adj() if self.map.is_safe(adj)]
+        if not self.time_left():
+            self.report('escape', False)
+            # Keep going straight if that's safe. Otherwise, anywhere safe will do.
+            if head.adj(self.snake.direc) in moves or not moves:
+                return self.snake.direc
+            return head.direction_to(moves[0])
+        self.report('escape', True)
+        # Moves into a pocket that's too small for the snake are pretty much suicide,
+        # so the moves with the most room go first.
+        if len(moves) > 1:
+            rooms = self.__path_solver.rooms_after(moves, self.snake.len())
+            most = max(rooms)
+            moves = [adj for adj, room in zip(moves, rooms) if room == most]
+        if len(moves) == 1:  # No need to measure distances.
+            return head.direction_to(moves[0])
+        if self.__field is not None:
+            from_food = self.__field.field
+        else:
+            from_food = self.__path_solver.distance_field(self.map.food)
         direc, max_dist = self.snake.direc, -1
-        for adj in head.all_adj():
-            if self.map.is_safe(adj):
-                dist = Pos.manhattan_distance(adj, self.map.food)
-                if dist > max_dist:
-                    max_dist = dist
-                    direc = head.direction_to(adj)
+        for adj in moves:
+            dist = from_food[self.map.idx_of(adj)]
+            if dist < 0:
+                dist = self.map.capacity
+            if dist > max_dist:
+                max_dist = dist
+                direc = head.direction_to(adj)
         return direc
+
+    def __make_plan(self, path):
+        """
+        Commits to a path. Its first direction is about to be taken, so the plan is the rest of it.
+        :param path: The path, a deque of directions.
+        :return: Void.
+        """
+        if not self.__commit_plans:
+            return
+        self.__plan = deque(path)
+        self.__plan_head = self.snake.head().adj(self.__plan.popleft())
+        self.__plan_food = self.map.food
+
+    def __planned_direc(self):
+        """
+        Takes the next direction of the plan, if the plan still holds.
+        :return: The next direction of the plan, or Direc.NONE if there's no plan (anymore).
+        """
+        plan = self.__plan
+        if not plan:
+            return Direc.NONE
+        head = self.snake.head()
+        if head != self.__plan_head or self.map.food != self.__plan_food:
+            plan.clear()
+            return Direc.NONE
+        direc = plan.popleft()
+        nxt = head.adj(direc)
+        if not self.map.is_safe(nxt):
+            plan.clear()
+            return Direc.NONE
+        self.__plan_head = nxt
+        return direc
+
+    def __food_direc(self):
+        """
+        Steps 1 to 3. The verdict only depends on the state of the game, so if the exact same state has come up
+        before (which happens a lot while chasing the tail), then it is taken from the cache instead.
+        Only this part is cached. Step 4 is left random, so that the snake doesn't get stuck in a loop.
+        A verdict that was cut short by the deadline isn't cached, since it might be wrong.
+        If a safe path is found, then the snake commits to it.
+        :return: The direction towards the food if it's safe to go there, else Direc.NONE.
+        """
+        if not self.time_left():
+            self.report('food', False)
+            return Direc.NONE
+        key = None if self.__cache is None else self.snake.zobrist
+        direc = None if key is None else self.__cache.get(key)
+        if direc is None:
+            self.__path_solver.deadline = self.deadline
+            self.__food_cut = False
+            direc = self.__search_food_direc()
+            completed = not (self.__path_solver.timed_out or self.__food_cut)
+            if key is not None and completed:
+                self.__cache.put(key, direc)
+        else:
+            completed = True
+        self.report('food', completed)
+        if self.__food_path:  # Not if the verdict came from the cache.
+            self.__make_plan(self.__food_path)
+        return direc
+
+    def __search_food_direc(self):
+        """
+        Steps 1 to 3, worked out from scratch.
+        :return: The direction towards the food if it's safe to go there, else Direc.NONE.
+        """
+        # Step 1: Get the path to the food. If path 1 exists, move to step 2.
+        # Otherwise, move to step 4.
+        self.__path_solver.snake = self.snake  # That's my snake you're looking at!
+        if self.__path_solver.food_engine == 'shortest':
+            # The BFS is going to spread out from the head anyway, so it might as well find the tail too.
+            # That way step 4 doesn't have to search all over again.
+            path_to_food, self.__tail_path = self.__path_solver.paths_to_many([self.map.food, self.snake.tail()])
+        else:
+            path_to_food = self.__path_solver.shortest_path_to_food()
+        if path_to_food:
+            # Step 2: Let the snake eat the food along the path. We'll take it all back afterwards with undo,
+            # so there's no need to clone the snake.
+            records = []
+            for direc in path_to_food:
+                if not self.time_left():
+                    # Long paths take a while to walk through, so this keeps an eye on the clock too.
+                    self.__food_cut = True
+                    break
+                records.append(self.snake.apply(direc))
+            safe = False  # Not unless it got to the food, at least.
+            if not self.__food_cut:
+                safe = self.map.is_full()
+                if not safe:
+                    # Step 3: Check if the head can still get to the tail after eating food.
+                    # If it can, then move along the path to the food.
+                    # Otherwise, go to step 4.
+                    safe = self.__path_solver.can_reach_tail()
+            for record in reversed(records):
+                self.snake.undo(record)
+            if safe:
+                self.__food_path = path_to_food
+                return path_to_food[0]
+        return Direc.NONE
@@ -34,12 +34,17 @@ class HamiltonSolver(BaseSolver):
     A snake called Hamilton. It goes around in big, big circles.
     """
 
-    def __init__(self, snake, shortcuts=True):
+    def __init__(self, snake, shortcuts=True, food_path_type='shortest'):
+        """
+        :param snake: The snake to steer.
+        :param shortcuts: Whether to take shortcuts to the food when the snake is still short.
+        :param food_path_type: How to find the path to the food for the shortcuts. See PathSolver.
+        """
         if snake.map.num_rows % 2 != 0 or snake.map.num_cols % 2 != 0:
             raise ValueError('num_rows and num_cols must be even.')
         super().__init__(snake)
         self.__shortcuts = shortcuts
-        self.__path_solver = PathSolver(snake)
+        self.__path_solver = PathSolver(snake, food_path_type)
         self.__table = [[_TableCell() for _ in range(snake.map.num_cols)] for _ in range(snake.map.num_rows)]
         self.__build_cycle()
 
@@ -50,16 +55,32 @@ class HamiltonSolver(BaseSolver):
         """
         return self.__table
 
-    def next_direc(self):
+    def next_direc(self, budget_ms=None):
         """
         Gets the next direction, taking shortcuts if it won't disrupt the cycle.
+        The cycle is always safe, so if the time runs out, the shortcut is just skipped.
+        :param budget_ms: How many milliseconds this may take. None means as long as it takes.
+        :return: The next direction to go in of type Direc.
+        """
+        self.start_tick(budget_ms)
+        nxt_direc = self.__next_direc()
+        self.end_tick()
+        return nxt_direc
+
+    def __next_direc(self):
+        """
         :return: The next direction to go in of type Direc.
         """
         head = self.snake.head()
         nxt_direc = self.__table[head.x][head.y].direc
         # We should take shortcuts if the snake isn't too long, to speed up gameplay.
         if self.__shortcuts and self.snake.len() < 0.5 * self.map.capacity:
+            if not self.time_left():
+                self.report('shortcut', False)
+                return nxt_direc
+            self.__path_solver.deadline = self.deadline
             path = self.__path_solver.shortest_path_to_food()
+            self.report('shortcut', not self.__path_solver.timed_out)
             # Check if there is a path from the head to the food.
             if path:
                 tail, nxt, food = self.snake.tail(), head.adj(path[0]), self.map.food
@@ -0,0 +1,315 @@
+# coding=utf-8
+"""
+Definition of ClusterGraph, the abstract graph behind hierarchical pathfinding (HPA*) on very big maps.
+The map is cut up into square clusters. Wherever two clusters touch through free cells, there's an entrance.
+A path is first planned from entrance to entrance, which only looks at a handful of cells per cluster,
+and then filled in one cluster at a time.
+"""
+import heapq
+from collections import deque
+
+_LONG_RUN = 6
+# An entrance at least this wide gets a transition at both ends instead of only one in the middle,
+# so that paths going past it near one end don't have to make a detour through the middle.
+
+
+class ClusterGraph:
+    """
+    The clusters of a map, and the graph of their entrances.
+
+    Each entrance is a run of free cells along the edge between two clusters, with free cells right across from them.
+    Its transitions are the pairs of cells across the edge that paths are allowed to cross at, and the cells of the
+    transitions are the nodes of the graph. Nodes in different clusters are linked by their transitions (one step),
+    and nodes in the same cluster are linked by the length of the shortest path between them inside the cluster.
+
+    The graph listens to the map. Changed cells are only written down as they come in, and the clusters they are in
+    are rebuilt the next time a path is asked for, along with their neighbours if the edge between them changed.
+    A cell that ends up back the way it was (like after GreedySolver takes a simulated move back) costs nothing.
+    Call detach when you don't need it anymore, so that the map stops updating it.
+    """
+
+    def __init__(self, m, cluster_size=10):
+        """
+        :param m: The map to cut up, of type Map.
+        :param cluster_size: The width and height of a cluster, in cells.
+        """
+        if cluster_size < 2:
+            raise ValueError('\'cluster_size\' must be at least 2.')
+        self.__map = m
+        rows, cols = m.num_rows, m.num_cols
+        num_cx, num_cy = -(-rows // cluster_size), -(-cols // cluster_size)
+        num_clusters = num_cx * num_cy
+        self.__cluster_of = [(idx // cols // cluster_size) * num_cy + idx % cols // cluster_size
+                             for idx in range(rows * cols)]
+        # The pairs of cells across each edge between two clusters, keyed by the two cluster ids.
+        self.__edges = {}
+        self.__edges_of = [[] for _ in range(num_clusters)]
+        self.__edges_at = {}  # The edges each cell sits on, for the cells on the rim of a cluster.
+        for cx in range(num_cx):
+            for cy in range(num_cy):
+                c = cx * num_cy + cy
+                xs = range(cx * cluster_size, min((cx + 1) * cluster_size, rows))
+                ys = range(cy * cluster_size, min((cy + 1) * cluster_size, cols))
+                if cy + 1 < num_cy:  # The cluster to the right.
+                    y = ys[-1]
+                    self.__add_edge(c, c + 1, [(x * cols + y, x * cols + y + 1) for x in xs])
+                if cx + 1 < num_cx:  # The cluster below.
+                    x = xs[-1]
+                    self.__add_edge(c, c + num_cy, [(x * cols + y, (x + 1) * cols + y) for y in ys])
+        self.__transitions = {key: [] for key in self.__edges}
+        self.__partners = {}  # The nodes across the edge from each node.
+        self.__intra = [{} for _ in range(num_clusters)]  # For each cluster, node -> [(other node, distance)].
+        self.__free = bytearray(rows * cols)  # Whether each cell was free as of the last update.
+        self.__pending = set()
+        self.__stale = True
+        self.__expanded = 0
+        m.add_observer(self)
+
+    def __add_edge(self, a, b, pairs):
+        """
+        :param a: The id of a cluster.
+        :param b: The id of the cluster next to it.
+        :param pairs: The pairs of cells across the edge, each with the cell in a first.
+        :return: Void.
+        """
+        key = (a, b)
+        self.__edges[key] = pairs
+        self.__edges_of[a].append(key)
+        self.__edges_of[b].append(key)
+        for p, q in pairs:
+            self.__edges_at.setdefault(p, []).append(key)
+            self.__edges_at.setdefault(q, []).append(key)
+
+    def detach(self):
+        """
+        Stops listening to the map. The graph won't be up to date after this.
+        :return: Void.
+        """
+        self.__map.remove_observer(self)
+
+    def on_reset(self):
+        """
+        Called by the map after it is reset. Every cluster will be rebuilt.
+        :return: Void.
+        """
+        self.__stale = True
+        self.__pending.clear()
+
+    def on_change(self, idx, old, new):
+        """
+        Writes down a changed cell, to be looked at in the next update.
+        :param idx: The id of the cell that changed.
+        :param old: The old PointType value.
+        :param new: The new PointType value.
+        :return: Void.
+        """
+        if not self.__stale:
+            self.__pending.add(idx)
+
+    @property
+    def expanded(self):
+        """
+        :return: The number of nodes expanded by the last abstract search. Handy for benchmarks.
+        """
+        return self.__expanded
+
+    def cluster_of(self, idx):
+        """
+        :param idx: The id of a cell.
+        :return: The id of the cluster the cell is in.
+        """
+        return self.__cluster_of[idx]
+
+    def nodes(self, c):
+        """
+        :param c: The id of a cluster.
+        :return: The nodes of the cluster (cell ids), as of the last update.
+        """
+        return list(self.__intra[c])
+
+    def update(self):
+        """
+        Rebuilds the clusters that changed since the last update.
+        :return: The number of clusters rebuilt.
+        """
+        m = self.__map
+        is_safe, free = m.is_safe_idx, self.__free
+        dirty_edges, dirty = set(), set()
+        if self.__stale:
+            for idx in range(len(free)):
+                free[idx] = is_safe(idx)
+            dirty_edges.update(self.__edges)
+            dirty.update(range(len(self.__intra)))
+            self.__stale = False
+        else:
+            for idx in self.__pending:
+                now = is_safe(idx)
+                if now != free[idx]:
+                    free[idx] = now
+                    dirty.add(self.__cluster_of[idx])
+                    dirty_edges.update(self.__edges_at.get(idx, ()))
+        self.__pending.clear()
+        for key in dirty_edges:
+            if self.__build_transitions(key):
+                dirty.update(key)  # The nodes on both sides have changed.
+        for c in dirty:
+            self.__build_intra(c)
+        return len(dirty)
+
+    def __build_transitions(self, key):
+        """
+        Finds the entrances along an edge, and puts transitions on them.
+        :param key: The edge, as the pair of cluster ids.
+        :return: Whether the transitions are any different from before.
+        """
+        partners, free = self.__partners, self.__free
+        transitions = []
+        run = []
+        for p, q in self.__edges[key] + [(None, None)]:  # The last one closes off the last run.
+            if p is not None and free[p] and free[q]:
+                run.append((p, q))
+                continue
+            if len(run) >= _LONG_RUN:
+                transitions.append(run[0])
+                transitions.append(run[-1])
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+        if transitions == self.__transitions[key]:
+            return False
+        for p, q in self.__transitions[key]:
+            partners[p].remove(q)
+            partners[q].remove(p)
+        for p, q in transitions:
+            partners.setdefault(p, []).append(q)
+            partners.setdefault(q, []).append(p)
+        self.__transitions[key] = transitions
+        return True
+
+    def __build_intra(self, c):
+        """
+        Links up the nodes of a cluster with the distances between them inside the cluster.
+        :param c: The id of the cluster.
+        :return: Void.
+        """
+        nodes = set()
+        for key in self.__edges_of[c]:
+            for p, q in self.__transitions[key]:
+                nodes.add(p if self.__cluster_of[p] == c else q)
+        intra = {}
+        for node in nodes:
+            dist = self.local_search(node, c)[0]
+            intra[node] = [(other, dist[other]) for other in nodes if other != node and other in dist]
+        self.__intra[c] = intra
+
+    def local_search(self, src, c):
+        """
+        A BFS from src that doesn't leave the cluster. src doesn't have to be free.
+        :param src: The id of the starting cell.
+        :param c: The id of the cluster.
+        :return: Two dicts keyed by the cells reached: their distance from src, and their parent cell.
+        """
+        neighbors, is_safe, cluster_of = self.__map.neighbors, self.__map.is_safe_idx, self.__cluster_of
+        dist, parent = {src: 0}, {src: -1}
+        queue = deque()
+        queue.append(src)
+        while queue:
+            cur = queue.popleft()
+            adj_dist = dist[cur] + 1
+            for adj in neighbors[cur]:
+                if adj not in dist and cluster_of[adj] == c and is_safe(adj):
+                    dist[adj] = adj_dist
+                    parent[adj] = cur
+                    queue.append(adj)
+        return dist, parent
+
+    def path(self, src, des):
+        """
+        Finds a path from src to des. It's planned over the clusters' entrances with A*, then filled in cell by cell.
+        It can be a few steps longer than the shortest path, but it's found whenever there is a path at all,
+        since every way between two clusters goes through one of their entrances.
+        :param src: The id of the starting cell. It doesn't have to be free.
+        :param des: The id of the destination, which does.
+        :return: A list of the cells after src on the way to des, des included. Empty if there's no path.
+        """
+        self.update()
+        if src == des:
+            self.__expanded = 0
+            return []
+        cluster_of, intra, partners = self.__cluster_of, self.__intra, self.__partners
+        cols = self.__map.num_cols
+        src_c, des_c = cluster_of[src], cluster_of[des]
+        src_dist, src_parent = self.local_search(src, src_c)
+        des_dist, des_parent = self.local_search(des, des_c)  # Read backwards, this is every way into des.
+        des_x, des_y = divmod(des, cols)
+        # src isn't free, so it's never on an entrance. Stepping from it straight into the next cluster
+        # has to be looked at separately, from each free cell right across the edge.
+        entries = {}
+        for adj in self.__map.neighbors[src]:
+            if cluster_of[adj] != src_c and self.__map.is_safe_idx(adj):
+                entries[adj] = self.local_search(adj, cluster_of[adj])[0]
+
+        def links(node):
+            if node == src:
+                out = [(other, src_dist[other]) for other in intra[src_c] if other in src_dist]
+                out.extend((adj, 1) for adj in entries)
+                if des in src_dist:
+                    out.append((des, src_dist[des]))
+                return out
+            c = cluster_of[node]
+            out = intra[c].get(node, []) + [(other, 1) for other in partners.get(node, ())]
+            if node in entries:
+                dist = entries[node]
+                out.extend((other, dist[other]) for other in intra[c] if other in dist and other != node)
+            if node in des_dist:
+                out.append((des, des_dist[node]))
+            return out
+
+        # A* over the nodes, with the Manhattan distance as the heuristic.
+        dist, came_from, closed = {src: 0}, {src: -1}, set()
+        heap = [(0, 0, 0, src)]
+        pushed = expanded = 0
+        while heap:
+            cur = heapq.heappop(heap)[3]
+            if cur in closed:
+                continue
+            closed.add(cur)
+            expanded += 1
+            if cur == des:
+                break
+            for adj, cost in links(cur):
+                adj_dist = dist[cur] + cost
+                if adj not in closed and adj_dist < dist.get(adj, adj_dist + 1):
+                    dist[adj] = adj_dist
+                    came_from[adj] = cur
+                    adj_x, adj_y = divmod(adj, cols)
+                    pushed += 1
+                    heapq.heappush(heap, (adj_dist + abs(adj_x - des_x) + abs(adj_y - des_y), -adj_dist, pushed, adj))
+        self.__expanded = expanded
+        if des not in closed:
+            return []
+
+        # Fill in the path, one hop at a time.
+        hops = [des]
+        while hops[-1] != src:
+            hops.append(came_from[hops[-1]])
+        hops.reverse()
+        cells = []
+        for a, b in zip(hops, hops[1:]):
+            if cluster_of[a] != cluster_of[b]:
+                cells.append(b)  # Straight across the edge.
+            elif b == des and a != src:
+                # The search from des already knows the way. Its parents point towards des.
+                cur = des_parent[a]
+                while cur != -1:
+                    cells.append(cur)
+                    cur = des_parent[cur]
+            else:
+                parent = src_parent if a == src else self.local_search(a, cluster_of[a])[1]
+                piece = []
+                cur = b
+                while cur != a:
+                    piece.append(cur)
+                    cur = parent[cur]
+                cells.extend(reversed(piece))
+        return cells
@@ -0,0 +1,218 @@
+# coding=utf-8
+"""
+Definition of IncrementalDistanceField, a distance field to the food that is repaired instead of rebuilt.
+From one tick to the next, only a few cells change: the new head, the old tail, and every now and then the food.
+So instead of a BFS over the whole map every time, only the part of the field that depends on those cells is redone.
+"""
+import heapq
+from collections import deque
+
+from snake.map.point import PointType
+
+_EMPTY = PointType.EMPTY.value
+_FOOD = PointType.FOOD.value
+
+
+class IncrementalDistanceField:
+    """
+    The distance from every cell to the food, going only through empty cells and food,
+    just like PathSolver.distance_field(food). -1 means the cell can't get to the food.
+
+    The field listens to the map, like a Bitboard does, but it is lazy about it:
+    changes are only written down as they come in, and the field is repaired the next time someone asks for it.
+    That way, all the moves that GreedySolver simulates and takes back again cost next to nothing.
+
+    A repair goes in two rounds:
+    1.  Every cell that got blocked is dropped from the field. So is every cell that was only as close to the food
+        as it was because of a dropped cell, i.e. it has no neighbour left that is one step closer to the food.
+    2.  The dropped cells (if they're still free) and the cells that just became free get a distance from their
+        neighbours, and the distances are spread out from there, like Dijkstra, until nothing gets any shorter.
+    Both rounds only touch cells that are affected by the change.
+    If the food moves, or too many cells changed at once, then the field is just built again from scratch.
+
+    Call detach when you don't need it anymore, so that the map stops updating it.
+    """
+
+    def __init__(self, m, max_pending=0.25):
+        """
+        :param m: The map to watch, of type Map.
+        :param max_pending: If more than this fraction of the cells change between two repairs,
+        then it's cheaper to rebuild the field, so changes stop being written down.
+        """
+        self.__map = m
+        self.__dist = [-1] * len(m.cells)
+        self.__root = -1  # The id of the food the field was built for. -1 if it wasn't built for any food.
+        self.__pending = set()
+        self.__max_pending = max(1, int(max_pending * len(m.cells)))
+        self.__stale = True  # Whether the field needs to be built again from scratch.
+        self.__touched = 0
+        m.add_observer(self)
+
+    def detach(self):
+        """
+        Stops listening to the map. The field won't be up to date after this.
+        :return: Void.
+        """
+        self.__map.remove_observer(self)
+
+    def on_reset(self):
+        """
+        Called by the map after it is reset. Everything has changed, so the field will be built again.
+        :return: Void.
+        """
+        self.__stale = True
+        self.__pending.clear()
+
+    def on_change(self, idx, old, new):
+        """
+        Writes down a cell that went from free to not free, or the other way around.
+        :param idx: The id of the cell that changed.
+        :param old: The old PointType value.
+        :param new: The new PointType value.
+        :return: Void.
+        """
+        if self.__stale or (old == _EMPTY or old == _FOOD) == (new == _EMPTY or new == _FOOD):
+            return
+        self.__pending.add(idx)
+        if len(self.__pending) > self.__max_pending:
+            self.__stale = True
+            self.__pending.clear()
+
+    @property
+    def touched(self):
+        """
+        :return: The number of cells the last repair (or rebuild) had to look at. Handy for benchmarks.
+        """
+        return self.__touched
+
+    @property
+    def field(self):
+        """
+        :return: The distances to the food, indexed by cell id (see Map.idx_of). -1 means the food can't be reached.
+        It's the field's own list, so look but don't touch.
+        """
+        self.__update()
+        return self.__dist
+
+    def distance(self, pos):
+        """
+        Gets the distance from a position to the food.
+        The position doesn't have to be free, so this works for the snake's head:
+        it's one more than the distance of its closest free neighbour.
+        :param pos: The position of type Pos.
+        :return: The number of steps to the food, or -1 if the food can't be reached (or there is no food).
+        """
+        dist = self.field
+        idx = self.__map.idx_of(pos)
+        if idx == self.__root or dist[idx] >= 0:
+            return dist[idx]
+        best = -1
+        for adj in self.__map.neighbors[idx]:
+            d = dist[adj]
+            if d >= 0 and (best < 0 or d + 1 < best):
+                best = d + 1
+        return best
+
+    def __update(self):
+        """
+        Brings the field up to date, by repairing it or by building it again.
+        :return: Void.
+        """
+        food = self.__map.food
+        root = -1 if food is None else self.__map.idx_of(food)
+        if root != self.__root:
+            self.__stale = True
+        if self.__stale:
+            self.__rebuild(root)
+        elif self.__pending:
+            self.__repair()
+
+    def __rebuild(self, root):
+        """
+        Builds the field from scratch, with a BFS from the food.
+        :param root: The id of the food, or -1 if there is no food.
+        :return: Void.
+        """
+        m = self.__map
+        dist = self.__dist
+        dist[:] = [-1] * len(dist)
+        self.__root = root
+        self.__stale = False
+        self.__pending.clear()
+        self.__touched = 0
+        if root < 0:
+            return
+        neighbors, is_safe = m.neighbors, m.is_safe_idx
+        dist[root] = 0
+        queue = deque()
+        queue.append(root)
+        while queue:
+            cur = queue.popleft()
+            adj_dist = dist[cur] + 1
+            for adj in neighbors[cur]:
+                if dist[adj] < 0 and is_safe(adj):
+                    dist[adj] = adj_dist
+                    queue.append(adj)
+        self.__touched = len(dist)
+
+    def __repair(self):
+        """
+        Repairs the field around the cells that changed since the last time. See the class docstring.
+        :return: Void.
+        """
+        m, dist, root = self.__map, self.__dist, self.__root
+        neighbors, is_safe = m.neighbors, m.is_safe_idx
+        pending = self.__pending
+        touched = len(pending)
+
+        # Round 1: Drop the blocked cells, and everything that was leaning on them.
+        dropped = []
+        stack = []
+        for idx in pending:
+            if idx != root and dist[idx] >= 0 and not is_safe(idx):
+                stack.append((idx, dist[idx]))
+                dist[idx] = -1
+        while stack:
+            cur, cur_dist = stack.pop()
+            child_dist = cur_dist + 1
+            for adj in neighbors[cur]:
+                if dist[adj] != child_dist or adj == root:
+                    continue
+                # Is there still a neighbour one step closer to the food?
+                supported = False
+                for sup in neighbors[adj]:
+                    if dist[sup] == cur_dist:
+                        supported = True
+                        break
+                if not supported:
+                    dist[adj] = -1
+                    dropped.append(adj)
+                    stack.append((adj, child_dist))
+                    touched += 1
+
+        # Round 2: Give the dropped cells and the newly freed cells a distance from their neighbours,
+        # then spread it out for as long as it makes things shorter.
+        heap = []
+        for idx in set(dropped).union(idx for idx in pending if dist[idx] < 0 and is_safe(idx)):
+            best = -1
+            for adj in neighbors[idx]:
+                d = dist[adj]
+                if d >= 0 and (best < 0 or d + 1 < best):
+                    best = d + 1
+            if best >= 0:
+                dist[idx] = best
+                heap.append((best, idx))
+        heapq.heapify(heap)
+        while heap:
+            cur_dist, cur = heapq.heappop(heap)
+            if cur_dist != dist[cur]:
+                continue  # There's a shorter one further up the heap.
+            touched += 1
+            adj_dist = cur_dist + 1
+            for adj in neighbors[cur]:
+                d = dist[adj]
+                if (d < 0 or d > adj_dist) and is_safe(adj):
+                    dist[adj] = adj_dist
+                    heapq.heappush(heap, (adj_dist, adj))
+        pending.clear()
+        self.__touched = touched
@@ -0,0 +1,265 @@
+# coding=utf-8
+"""
+Definitions for LookaheadSolver.
+This snake thinks before it moves. It tries every sequence of moves up to a few moves ahead on the real snake,
+with apply and undo, and scores where each one ends up. It goes with the first move of the best sequence.
+A sequence ends early if the snake dies, or if it eats the food, since nobody knows where the next food will be.
+The scores, from best to worst:
+Win:        The snake fills up the map.
+Eat:        The snake eats the food, and can still get to its tail afterwards. Sooner is better.
+Leaf:       The snake is still alive after the last move. Being able to get to the tail counts the most,
+            then the room the head has (up to the snake's length, which is all the room it needs),
+            then being close to the food.
+Trap:       The snake eats the food, but can't get to its tail anymore. It's scored like a leaf without the tail.
+Dead:       The snake runs into something, or has nowhere left to go. Later is better.
+The search goes one move deeper at a time (iterative deepening), so if the time runs out, there's always an answer
+from the last depth that was searched all the way. Every state it scores is remembered in a transposition table,
+keyed by the Zobrist hash of the snake, so states that come up again (on this tick or later ones) are free.
+With a pool (see BaseSolver.start_pool), each move is searched by a worker, which keeps a table of its own.
+"""
+import time
+
+from snake.solver import PathSolver, TranspositionCache
+from snake.solver.base import BaseSolver
+
+
+_worker_solvers = {}
+# The solvers of a worker process, one per map size and settings. They live as long as the worker does,
+# so their transposition tables carry over from one tick to the next, just like the main one does.
+
+
+def _deepen_in_worker(snake, direc, max_depth, cache_bytes, budget_ms):
+    """
+    Searches one move in a worker process. See LookaheadSolver.deepen.
+    :return: The scores of the move at each depth, and the number of states searched.
+    """
+    key = (snake.map.num_rows, snake.map.num_cols, max_depth, cache_bytes)
+    solver = _worker_solvers.get(key)
+    if solver is None:
+        solver = _worker_solvers[key] = LookaheadSolver(snake, max_depth, cache_bytes)
+    solver.snake = snake
+    return solver.deepen(direc, budget_ms)
+
+
+class LookaheadSolver(BaseSolver):
+    """    A snake that looks a few moves ahead. Not many, but more than the greedy one.    """
+
+    def __init__(self, snake, max_depth=6, cache_bytes=1 << 22):
+        """
+        :param snake: The snake to steer.
+        :param max_depth: How many moves ahead to look, at most.
+        :param cache_bytes: The memory cap of the transposition table, in bytes.
+        """
+        if max_depth < 1:
+            raise ValueError('\'max_depth\' must be at least 1.')
+        super().__init__(snake)
+        self.__path_solver = PathSolver(snake)
+        self.__max_depth = max_depth
+        self.__cache_bytes = cache_bytes
+        self.__cache = TranspositionCache(cache_bytes)
+        capacity = snake.map.capacity
+        # Every score band is wider than everything below it put together, so it always wins.
+        self.__reach_bonus = 4 * capacity
+        self.__eat_score = 16 * capacity
+        self.__win_score = 32 * capacity
+        self.__dead_score = -32 * capacity
+        self.__from_food = []
+        self.__depth = 0
+        self.__nodes = 0
+        self.__total_nodes = 0
+        self.__total_time = 0.0
+
+    @property
+    def cache(self):
+        """
+        :return: The transposition table.
+        """
+        return self.__cache
+
+    @property
+    def max_depth(self):
+        """
+        :return: How many moves ahead the snake looks, at most.
+        """
+        return self.__max_depth
+
+    @max_depth.setter
+    def max_depth(self, val):
+        self.__max_depth = val
+
+    @property
+    def depth(self):
+        """
+        :return: The deepest search that was finished on the last tick.
+        """
+        return self.__depth
+
+    @property
+    def nodes(self):
+        """
+        :return: The number of states searched on the last tick, including the ones found in the table.
+        """
+        return self.__nodes
+
+    @property
+    def nodes_per_sec(self):
+        """
+        :return: The number of states searched per second, over every tick so far. This is the one to tune.
+        """
+        return self.__total_nodes / self.__total_time if self.__total_time else 0.0
+
+    def next_direc(self, budget_ms=None):
+        """
+        Searches one move deeper at a time, until max_depth or until the time is up.
+        A depth that gets cut short is thrown out, and the last complete one decides.
+        The snake's own direction is tried first, so that it goes straight when it doesn't matter.
+        :param budget_ms: How many milliseconds this may take. None means max_depth, however long that takes.
+        :return: A direction of type Direc.
+        """
+        self.start_tick(budget_ms)
+        start = time.perf_counter()
+        self.__nodes = self.__depth = 0
+        self.__prepare()
+        moves = self.__moves()
+        best = moves[0] if moves else self.snake.direc
+        if len(moves) > 1:  # Otherwise, there's nothing to think about.
+            by_depth = None
+            if self.parallel:
+                # Every worker goes through all the depths for its own move, so that it only takes one round trip,
+                # and so that each depth finds the states of the one before it in the worker's own table.
+                left_ms = None if self.deadline is None else max(0.0, 1000 * (self.deadline - time.perf_counter()))
+                results = self.score_moves(_deepen_in_worker, moves, self.__max_depth, self.__cache_bytes, left_ms)
+                by_depth = [scores for scores, _ in results]
+                self.__nodes += sum(nodes for _, nodes in results)
+            completed = True
+            for depth in range(1, self.__max_depth + 1):
+                if by_depth is None:
+                    scores = [self.__score_move(direc, depth - 1) for direc in moves]
+                else:
+                    # A worker stops at the depth where its move gets to the food, or when the time is up.
+                    scores = [move_scores[depth - 1] if len(move_scores) >= depth else None
+                              for move_scores in by_depth]
+                if None in scores:
+                    completed = False  # The time ran out.
+                    break
+                self.__depth = depth
+                best = moves[scores.index(max(scores))]
+                if max(scores) >= self.__eat_score:
+                    break  # Food that's safe to eat doesn't get any closer by looking further.
+            self.report('search', completed)
+        self.__total_nodes += self.__nodes
+        self.__total_time += time.perf_counter() - start
+        self.end_tick()
+        return best
+
+    def deepen(self, direc, budget_ms=None):
+        """
+        Searches a single move one move deeper at a time, just like next_direc does for all of them.
+        This is what the workers do.
+        :param direc: The direction to move in. It has to be safe.
+        :param budget_ms: How many milliseconds this may take. None means as long as it takes.
+        :return: The scores of the move at each depth, until max_depth, until it gets to the food safely,
+        or until the time is up, whichever comes first. And the number of states searched.
+        """
+        self.start_tick(budget_ms)
+        self.__nodes = 0
+        self.__prepare()
+        scores = []
+        for depth in range(1, self.__max_depth + 1):
+            score = self.__score_move(direc, depth - 1)
+            if score is None:
+                break
+            scores.append(score)
+            if score >= self.__eat_score:
+                break
+        self.end_tick()
+        return scores, self.__nodes
+
+    def __prepare(self):
+        """
+        Gets ready to search from the current state: points the path solver at the snake,
+        and works out the distance field from the food.
+        :return: Void.
+        """
+        self.__path_solver.snake = self.snake
+        food = self.map.food
+        self.__from_food = [] if food is None else self.__path_solver.distance_field(food, use_numpy=False)
+
+    def __moves(self):
+        """
+        :return: The directions the head can go in without dying right away, the snake's own direction first.
+        """
+        head, m = self.map.idx_of(self.snake.head()), self.map
+        moves = [direc for k, direc in enumerate(m.ADJ_DIRECS) if m.is_safe_idx(m.neighbors[head][k])]
+        if self.snake.direc in moves:
+            moves.remove(self.snake.direc)
+            moves.insert(0, self.snake.direc)
+        return moves
+
+    def __score_move(self, direc, depth):
+        """
+        Makes a move, scores the state after it, and takes the move back.
+        :param direc: The direction to move in.
+        :param depth: How many more moves to look ahead after this one.
+        :return: The score, or None if the time ran out.
+        """
+        record = self.snake.apply(direc)
+        score = self.__search(depth)
+        self.snake.undo(record)
+        return score
+
+    def __search(self, depth):
+        """
+        Scores the state of the snake by looking depth moves further ahead.
+        :param depth: How many more moves to look ahead.
+        :return: The score, or None if the time ran out.
+        """
+        self.__nodes += 1
+        if self.snake.dead:
+            return self.__dead_score - depth
+        if self.map.is_full():
+            return self.__win_score
+        key = (self.snake.zobrist, depth)
+        score = self.__cache.get(key)
+        if score is not None:
+            return score
+        if not self.map.has_food():
+            score = self.__evaluate(ate=True) + depth
+        elif depth == 0:
+            score = self.__evaluate(ate=False)
+        else:
+            if not self.__nodes & 0x3F and not self.time_left():
+                return None
+            moves = self.__moves()
+            if not moves:
+                return self.__dead_score - depth
+            score = self.__dead_score - depth
+            for direc in moves:
+                child = self.__score_move(direc, depth - 1)
+                if child is None:
+                    return None
+                if child > score:
+                    score = child
+        self.__cache.put(key, score)
+        return score
+
+    def __evaluate(self, ate):
+        """
+        Scores a state without looking any further ahead.
+        The distance to the food comes from the distance field worked out at the start of the tick, which is close
+        enough, since the head can only have moved a few cells since then.
+        :param ate: Whether the snake just ate the food.
+        :return: The score.
+        """
+        snake, m = self.snake, self.map
+        room = self.__path_solver.rooms_after([snake.head()], snake.len())[0]
+        if self.__path_solver.can_reach_tail():
+            if ate:
+                return self.__eat_score + room
+            score = self.__reach_bonus + room
+        else:
+            score = room - self.__reach_bonus  # Eating into a trap is no better than any other trap.
+        if not ate:
+            dist = self.__from_food[m.idx_of(snake.head())] if self.__from_food else -1
+            score -= dist if dist >= 0 else m.capacity
+        return score
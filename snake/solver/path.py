@@ -3,32 +3,49 @@
 Definitions for PathSolver class, which is the path-finder for Greedy and Hamilton..
 Exported methods in PathSolver are longest path to tail and shortest path to food.
 """
+import heapq
 import random
 import sys
+import time
 from collections import deque
 
-from snake.map import PointType, Direc
+from snake.map import PointType, Direc, Pos
 from snake.solver.base import BaseSolver
+from snake.solver.hierarchy import ClusterGraph
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional. Without it, distance_field falls back to a plain BFS.
+    np = None
 
 
 class _TableCell:
-    def __init__(self):
-        self.reset()
+    """
+    A snapshot of one cell of the table, for anyone who wants to look at it.
+    """
+
+    def __init__(self, dist=sys.maxsize, parent=None, visit=False):
+        self.dist = dist
+        self.parent = parent
+        self.visit = visit
 
     def __str__(self):
-        return '{dist: {}  parent:{} visit:{}}'.format(self.dist, str(self.parent), self.visit)
+        return '{{dist: {}  parent:{} visit:{}}}'.format(self.dist, str(self.parent), self.visit)
 
     __repr__ = __str__
 
-    def reset(self):
-        """
-        Reset the table cell.
-        :return:
-        """
-        self.parent = None
-        self.dist = sys.maxsize
 
-        self.visit = False
+class _TableView:
+    """
+    Lets the flat table be read just like a 2d table of cells, so table[x][y].dist still works.
+    """
+
+    def __init__(self, num_cols, cell_at):
+        self.__num_cols = num_cols
+        self.__cell_at = cell_at
+
+    def __getitem__(self, x):
+        return [self.__cell_at(x * self.__num_cols + y) for y in range(self.__num_cols)]
 
 
 class PathSolver(BaseSolver):
@@ -37,39 +54,267 @@ class PathSolver(BaseSolver):
     1. Shortest path from the head to a certain point.
     2. Longest path from the head to a certain point.
     Each of the solvers contains a PathSolver which helps compute the tedious tasks, which the solvers then interpret.
+    The searches run on the integer cell ids of the map (see Map.neighbors), and only turn them back into
+    directions when building the path.
+
+    The table is kept in flat lists, indexed by cell id, and it is never reset.
+    Instead, every search gets a new stamp, and a cell only counts as visited
+    if its stamp is the one of the current search. So a search only pays for the cells it actually touches.
     """
 
-    def __init__(self, snake):
+    def __init__(self, snake, food_path_type='shortest', jps_fraction=0.1, cluster_size=10):
+        """
+        :param snake: The snake to find paths for.
+        :param food_path_type: The kind of path used by shortest_path_to_food.
+        Either shortest (BFS), astar, bidirectional or jps. They all give a shortest path,
+        but the others look at far fewer cells when the food is far away on an open map.
+        It can also be hierarchical, for really big maps. That path can be a bit longer than the shortest one,
+        so once the food is within one cluster of the head, it's back to the BFS.
+        :param jps_fraction: While the snake takes up less than this fraction of the map,
+        shortest_path_to_food uses jump point search instead of the BFS, since the map is mostly open.
+        0 turns this off.
+        :param cluster_size: The width and height of the clusters for hierarchical paths. See ClusterGraph.
+        """
         super().__init__(snake)
-        self.__table = [[_TableCell() for _ in range(snake.map.num_cols)] for _ in range(snake.map.num_rows)]
+        self.__food_path_type = food_path_type
+        self.__jps_fraction = jps_fraction
+        self.__cluster_size = cluster_size
+        self.__clusters = None  # The ClusterGraph, made the first time a hierarchical path is asked for.
+        self.__plan = []  # The cells of the last hierarchical path, head first, destination last.
+        self.__expanded = 0
+        num_cells = snake.map.num_rows * snake.map.num_cols
+        self.__dist = [sys.maxsize] * num_cells
+        self.__parent = [-1] * num_cells
+        self.__seen = [0] * num_cells  # Stamp of the last shortest path search that reached the cell.
+        self.__visit = [0] * num_cells  # Stamp of the last longest path search that put the cell on its path.
+        self.__closed = [0] * num_cells  # Stamp of the last A* search that expanded the cell.
+        self.__seen_back = [0] * num_cells  # Stamp of the last bidirectional search that reached the cell backwards.
+        self.__dist_back = [0] * num_cells
+        self.__child = [-1] * num_cells  # The next cell towards the destination, for the backward search.
+        self.__next = [-1] * num_cells  # The next cell on the path, for the longest path search.
+        self.__reach = [0] * num_cells  # Stamp of the last reachability check that reached the cell.
+        self.__stamp = 0
+        self.__search = 0  # The stamp of the last shortest path search.
+        self.__deadline = None
+        self.__timed_out = False
 
     @property
     def table(self):
         """
-        :return: Table. Used for Hamiltonian Cycle.
+        :return: Table, as left by the last search. Each cell has a dist, a parent (of type Pos) and a visit.
+        """
+        return _TableView(self.map.num_cols, self.__cell_at)
+
+    def __cell_at(self, idx):
+        """
+        :param idx: The id of a cell.
+        :return: A snapshot of that cell of the table, of type _TableCell.
+        """
+        if self.__seen[idx] != self.__search:
+            return _TableCell(visit=self.__visit[idx] == self.__stamp)
+        parent = self.__parent[idx]
+        return _TableCell(self.__dist[idx],
+                          None if parent < 0 else self.map.pos_of(parent),
+                          self.__visit[idx] == self.__stamp)
+
+    @property
+    def food_path_type(self):
+        """
+        :return: The kind of path used by shortest_path_to_food.
+        """
+        return self.__food_path_type
+
+    @food_path_type.setter
+    def food_path_type(self, val):
+        self.__food_path_type = val
+
+    @property
+    def jps_fraction(self):
+        """
+        :return: The fraction of the map below which shortest_path_to_food switches from BFS to jump point search.
+        """
+        return self.__jps_fraction
+
+    @jps_fraction.setter
+    def jps_fraction(self, val):
+        self.__jps_fraction = val
+
+    @property
+    def deadline(self):
+        """
+        :return: The time (as in time.perf_counter) at which searches give up, or None if they never do.
+        """
+        return self.__deadline
+
+    @deadline.setter
+    def deadline(self, val):
+        """
+        The searches for a path (except the hierarchical one), paths_to_many, can_reach and the pushing out of
+        longest_path_to keep an eye on the clock. They give up with whatever they have so far: no path,
+        the paths found so far, False, and the path pushed out so far (which is still a good path), respectively.
+        Setting the deadline also clears timed_out.
+        :param val: A time from time.perf_counter, or None.
         """
-        return self.__table
+        self.__deadline = val
+        self.__timed_out = False
+
+    @property
+    def timed_out(self):
+        """
+        :return: Whether a search gave up because of the deadline since the deadline was last set.
+        """
+        return self.__timed_out
+
+    def __past_deadline(self, count, mask=0xFF):
+        """
+        Checks the clock, but only every 256 steps, since asking for the time isn't free either.
+        :param count: The number of steps the search has taken so far.
+        :param mask: The clock is only checked when none of these bits of count are set.
+        Searches whose steps are expensive can check more often with a smaller mask.
+        :return: True if the search should give up.
+        """
+        if self.__deadline is None or count & mask or time.perf_counter() < self.__deadline:
+            return False
+        self.__timed_out = True
+        return True
+
+    @property
+    def expanded(self):
+        """
+        :return: The number of cells expanded by the last shortest path search. Handy for benchmarks.
+        """
+        return self.__expanded
+
+    @property
+    def food_engine(self):
+        """
+        :return: The kind of path shortest_path_to_food would go for right now.
+        This is food_path_type, unless the map is open enough for jump point search to take over from the BFS,
+        or a hierarchical path is asked for but the food is close enough for the BFS to get it exactly.
+        """
+        path_type = self.__food_path_type
+        if path_type == 'hierarchical' and \
+                Pos.manhattan_distance(self.snake.head(), self.map.food) <= self.__cluster_size:
+            path_type = 'shortest'
+        if path_type == 'shortest' and self.snake.len() < self.__jps_fraction * self.map.capacity:
+            path_type = 'jps'
+        return path_type
 
     def shortest_path_to_food(self):
         """
         :return: A deque of directions to go in to get the shortest path to food.
         """
-        return self.path_to(self.map.food, 'shortest')
+        return self.path_to(self.map.food, self.food_engine)
 
-    def longest_path_to_tail(self):
+    def longest_path_to_tail(self, path=None):
         """
+        :param path: The shortest path to the tail, if it's already known. See longest_path_to.
         :return: A deque of directions to go in to get the longest path to the tail.
         Used for hamiltonian cycle and greedy snake running away.
         """
+        if path is not None:
+            return self.longest_path_to(self.snake.tail(), path)
         return self.path_to(self.snake.tail(), 'longest')
 
+    def can_reach(self, des):
+        """
+        Check if the snake's head can get to the destination at all. This is a plain flood fill that stops as soon
+        as it bumps into the destination. No path is built and nothing is shuffled, so it's a lot cheaper than
+        asking for a path and checking if it is empty.
+        The destination counts as reachable even if it isn't empty (the tail, most of the time),
+        so unlike path_to, there's no need to touch the map.
+        :param des: The destination of type Pos.
+        :return: True if there is a path from the head to the destination.
+        """
+        self.__stamp += 1
+        stamp, reach = self.__stamp, self.__reach
+        m = self.map
+        neighbors, is_safe = m.neighbors, m.is_safe_idx
+        head, des = m.idx_of(self.snake.head()), m.idx_of(des)
+        if head == des:
+            return True
+        reach[head] = stamp
+        stack = [head]
+        count = 0
+        timed = self.__deadline is not None
+        while stack:
+            count += 1
+            if timed and self.__past_deadline(count):
+                return False
+            for adj in neighbors[stack.pop()]:
+                if adj == des:
+                    return True
+                if reach[adj] != stamp and is_safe(adj):
+                    reach[adj] = stamp
+                    stack.append(adj)
+        return False
+
+    def can_reach_tail(self):
+        """
+        The yes or no version of longest_path_to_tail.
+        :return: True exactly when longest_path_to_tail would give a path with more than one direction in it.
+        """
+        m = self.map
+        head, tail = m.idx_of(self.snake.head()), m.idx_of(self.snake.tail())
+        if head == tail:  # A snake that's all head can't chase its own tail.
+            return False
+        neighbors = m.neighbors
+        if tail not in neighbors[head]:
+            # The tail is at least two steps away, so any path there is long enough.
+            return self.can_reach(self.snake.tail())
+        # The tail is right next to the head, so the shortest path is a single step.
+        # It only gets longer if it can be pushed out sideways, just like longest_path_to would do it.
+        tests = (1, 3) if head - tail == 1 or tail - head == 1 else (0, 2)
+        return any(m.is_safe_idx(neighbors[head][k]) and m.is_safe_idx(neighbors[tail][k]) for k in tests)
+
+    def rooms_after(self, cells, limit):
+        """
+        Measures how much room the snake would have if its head moved into each of the cells.
+        The cell itself is taken up by the head then, so if it's a narrow gap, whatever it splits the free space into
+        is looked at separately, and only the biggest piece counts. The tail moves out of the way as the head moves in,
+        so it counts as room too.
+        Each piece is a flood fill that stops as soon as it has found limit cells, so an open map costs no more than
+        a cramped one. All the flood fills share the reachability table, with a fresh stamp for each cell.
+        :param cells: The positions to measure, of type Pos. These are normally the free cells next to the head.
+        :param limit: The most room worth knowing about. The snake's length is a good one.
+        :return: A list with the room for each cell, in the same order. None of them are more than limit.
+        """
+        m = self.map
+        neighbors, is_safe, reach = m.neighbors, m.is_safe_idx, self.__reach
+        tail = m.idx_of(self.snake.tail())
+        rooms = []
+        for pos in cells:
+            self.__stamp += 1
+            stamp = self.__stamp
+            src = m.idx_of(pos)
+            reach[src] = stamp  # The head would be here, so it isn't room anymore.
+            best = 0
+            for start in neighbors[src]:
+                if best >= limit:
+                    break
+                if reach[start] == stamp or not (start == tail or is_safe(start)):
+                    continue  # Already measured as part of another piece, or not room at all.
+                reach[start] = stamp
+                stack, size = [start], 0
+                while stack and size < limit:
+                    size += 1
+                    for adj in neighbors[stack.pop()]:
+                        if reach[adj] != stamp and (adj == tail or is_safe(adj)):
+                            reach[adj] = stamp
+                            stack.append(adj)
+                if size > best:
+                    best = size
+            rooms.append(min(best, limit))
+        return rooms
+
     def path_to(self, des, path_type):
         """
         This is a helper function that temporarily sets the point of the destination to empty.
         This is done so that it will be considered by the path_finding_algorithms, which only add points to the queue
         if they are empty.
         :param des: The destination of the path of type Pos.
-        :param path_type: Either shortest or longest. Switches between method shortest_path_to and longest_path_to.
+        :param path_type: Either shortest, astar, bidirectional, jps, hierarchical or longest. Switches between method
+        shortest_path_to, astar_path_to, bidirectional_path_to, jps_path_to, hierarchical_path_to and longest_path_to.
         :return: A deque of directions. Each direction is an enum Direc.
         """
         original_type = self.map.point(des).type
@@ -77,6 +322,14 @@ class PathSolver(BaseSolver):
         path = deque()
         if path_type == 'shortest':
             path = self.shortest_path_to(des)
+        elif path_type == 'astar':
+            path = self.astar_path_to(des)
+        elif path_type == 'bidirectional':
+            path = self.bidirectional_path_to(des)
+        elif path_type == 'jps':
+            path = self.jps_path_to(des)
+        elif path_type == 'hierarchical':
+            path = self.hierarchical_path_to(des)
         elif path_type == 'longest':
             path = self.longest_path_to(des)
         self.map.point(des).type = original_type
@@ -89,119 +342,490 @@ class PathSolver(BaseSolver):
         :param des: The destination position on the map of type Pos.
         :return: A deque of instructions(directions) for the snake.
         """
-        self.__reset_table()
-        head = self.snake.head()
-        self.__table[head.x][head.y].dist = 0
+        self.__stamp += 1
+        self.__search = stamp = self.__stamp
+        m, dist, parent, seen = self.map, self.__dist, self.__parent, self.__seen
+        neighbors, adj_direcs, is_safe = m.neighbors, m.ADJ_DIRECS, m.is_safe_idx
+        head, des = m.idx_of(self.snake.head()), m.idx_of(des)
+        dist[head], parent[head], seen[head] = 0, -1, stamp
         queue = deque()
         queue.append(head)
+        expanded = 0
         while queue:
             cur = queue.popleft()
+            expanded += 1
             if cur == des:
+                self.__expanded = expanded
                 return self.__build_path(head, des)
+            if self.__past_deadline(expanded):
+                break
+            if cur == head:
+                first_direc = self.snake.direc
+            else:
+                first_direc = m.direc_between(parent[cur], cur)
+            order = [0, 1, 2, 3]
+            random.shuffle(order)
+            # Arrange the order of traverse to make the path as straight as possible.
+            for i, k in enumerate(order):
+                if first_direc == adj_direcs[k]:
+                    order[0], order[i] = order[i], order[0]
+                    break
+            adjacents = neighbors[cur]
+            adj_dist = dist[cur] + 1
+            for k in order:
+                adj = adjacents[k]
+                if seen[adj] != stamp and is_safe(adj):  # If it hasn't been visited yet
+                    seen[adj] = stamp
+                    parent[adj] = cur
+                    dist[adj] = adj_dist
+                    queue.append(adj)
+        self.__expanded = expanded
+        return deque()
+
+    def paths_to_many(self, targets):
+        """
+        Find the shortest paths from the snake's head to a bunch of destinations, all with one BFS.
+        The search only goes on for as long as there are targets left to find.
+        Each path is the same as the one shortest_path_to would find if it was the only destination,
+        since a cell's parent never changes after the cell is first reached.
+        Like in can_reach, a target doesn't have to be empty (the tail, say) to be arrived at.
+        It just won't be walked through unless it's safe, so the map is never touched.
+        :param targets: The destinations, of type Pos.
+        :return: A list with a deque of directions for each target, in the same order.
+        A target that can't be reached gets an empty deque.
+        """
+        self.__stamp += 1
+        self.__search = stamp = self.__stamp
+        m, dist, parent, seen = self.map, self.__dist, self.__parent, self.__seen
+        neighbors, adj_direcs, is_safe = m.neighbors, m.ADJ_DIRECS, m.is_safe_idx
+        head = m.idx_of(self.snake.head())
+        targets = [m.idx_of(target) for target in targets]
+        left = set(targets)
+        left.discard(head)
+        dist[head], parent[head], seen[head] = 0, -1, stamp
+        queue = deque()
+        queue.append(head)
+        expanded = 0
+        while queue and left:
+            cur = queue.popleft()
+            expanded += 1
+            if self.__past_deadline(expanded):
+                break
             if cur == head:
                 first_direc = self.snake.direc
             else:
-                first_direc = self.__table[cur.x][cur.y].parent.direction_to(cur)
-            adjacents = cur.all_adj()
-            random.shuffle(adjacents)
+                first_direc = m.direc_between(parent[cur], cur)
+            order = [0, 1, 2, 3]
+            random.shuffle(order)
             # Arrange the order of traverse to make the path as straight as possible.
-            for i, pos in enumerate(adjacents):
-                if first_direc == cur.direction_to(pos):
-                    adjacents[0], adjacents[i] = adjacents[i], adjacents[0]
+            for i, k in enumerate(order):
+                if first_direc == adj_direcs[k]:
+                    order[0], order[i] = order[i], order[0]
                     break
-            for pos in adjacents:
-                if self.__is_valid(pos):
-                    adj_cell = self.__table[pos.x][pos.y]
-                    if adj_cell.dist == sys.maxsize:  # If it hasn't been visited yet
-                        adj_cell.parent = cur
-                        adj_cell.dist = self.__table[cur.x][cur.y].dist + 1
-                        queue.append(pos)
+            adjacents = neighbors[cur]
+            adj_dist = dist[cur] + 1
+            for k in order:
+                adj = adjacents[k]
+                if seen[adj] == stamp:
+                    continue
+                if adj in left:
+                    left.discard(adj)
+                elif not is_safe(adj):
+                    continue
+                seen[adj] = stamp
+                parent[adj] = cur
+                dist[adj] = adj_dist
+                if is_safe(adj):  # Targets that aren't safe are somewhere to arrive, not somewhere to go through.
+                    queue.append(adj)
+        self.__expanded = expanded
+        return [self.__build_path(head, target) if seen[target] == stamp else deque() for target in targets]
+
+    def astar_path_to(self, des):
+        """
+        Find the shortest path from the snake's head to the destination with A*.
+        The heuristic is the Manhattan distance (see Pos.manhattan_distance), worked out straight from the cell ids.
+        The snake can only move orthogonally, so it never overestimates, and the path is as short as the BFS one.
+        Among cells that look equally good, the one furthest from the head goes first, so that A* dives
+        towards the destination instead of fanning out over every equally short path.
+        After that, the one reached with fewer turns goes first,
+        which keeps the path as straight as possible, just like the BFS does.
+        :param des: The destination position on the map of type Pos.
+        :return: A deque of instructions(directions) for the snake.
+        """
+        self.__stamp += 1
+        self.__search = stamp = self.__stamp
+        m, dist, parent, seen, closed = self.map, self.__dist, self.__parent, self.__seen, self.__closed
+        neighbors, adj_direcs, is_safe = m.neighbors, m.ADJ_DIRECS, m.is_safe_idx
+        cols = m.num_cols
+        head, des = m.idx_of(self.snake.head()), m.idx_of(des)
+        des_x, des_y = divmod(des, cols)
+        turns = {head: 0}
+        dist[head], parent[head], seen[head] = 0, -1, stamp
+        head_x, head_y = divmod(head, cols)
+        heap = [(abs(head_x - des_x) + abs(head_y - des_y), 0, 0, 0, head)]
+        pushed = expanded = 0
+        while heap:
+            cur = heapq.heappop(heap)[4]
+            if closed[cur] == stamp:
+                continue  # An old entry, from before a better way here was found.
+            closed[cur] = stamp
+            cur_turns = turns[cur]
+            expanded += 1
+            if cur == des:
+                self.__expanded = expanded
+                return self.__build_path(head, des)
+            if self.__past_deadline(expanded):
+                break
+            cur_direc = self.snake.direc if cur == head else m.direc_between(parent[cur], cur)
+            adj_dist = dist[cur] + 1
+            for k, adj in enumerate(neighbors[cur]):
+                if closed[adj] == stamp or not is_safe(adj):
+                    continue
+                adj_turns = cur_turns if adj_direcs[k] == cur_direc else cur_turns + 1
+                if seen[adj] != stamp or adj_dist < dist[adj] or \
+                        (adj_dist == dist[adj] and adj_turns < turns[adj]):
+                    seen[adj], dist[adj], parent[adj], turns[adj] = stamp, adj_dist, cur, adj_turns
+                    adj_x, adj_y = divmod(adj, cols)
+                    pushed += 1
+                    heapq.heappush(heap, (adj_dist + abs(adj_x - des_x) + abs(adj_y - des_y), -adj_dist, adj_turns,
+                                          pushed, adj))
+        self.__expanded = expanded
         return deque()
 
-    def longest_path_to(self, des):
+    def bidirectional_path_to(self, des):
+        """
+        Find the shortest path from the snake's head to the destination with two BFSes,
+        one from the head and one from the destination, which meet in the middle.
+        Each round, the side with the smaller frontier is pushed out by a whole level.
+        Once the two sides touch, the rest of that level is still checked, in case there's an even shorter meeting.
+        Only cells next to the head are tried first in the snake's direction, to keep the path straight.
+        The destination has to be free (that's what path_to is for), but the head doesn't.
+        :param des: The destination position on the map of type Pos.
+        :return: A deque of instructions(directions) for the snake.
+        """
+        self.__stamp += 1
+        self.__search = stamp = self.__stamp
+        m, neighbors, is_safe = self.map, self.map.neighbors, self.map.is_safe_idx
+        dist, parent, seen = self.__dist, self.__parent, self.__seen
+        dist_back, child, seen_back = self.__dist_back, self.__child, self.__seen_back
+        head, des = m.idx_of(self.snake.head()), m.idx_of(des)
+        dist[head], parent[head], seen[head] = 0, -1, stamp
+        dist_back[des], child[des], seen_back[des] = 0, -1, stamp
+        first = neighbors[head][self.snake.direc.value - 1] if self.snake.direc != Direc.NONE else -1
+        head_order = sorted(neighbors[head], key=lambda adj: adj != first)
+        forward, backward = [head], [des]
+        best, meet, expanded = sys.maxsize, -1, 0
+        while forward and backward and meet < 0:
+            if self.__past_deadline(expanded, 0):  # Once per level.
+                break
+            if len(forward) <= len(backward):
+                nxt = []
+                for cur in forward:
+                    expanded += 1
+                    for adj in head_order if cur == head else neighbors[cur]:
+                        if seen_back[adj] == stamp:
+                            if dist[cur] + 1 + dist_back[adj] < best:
+                                best, meet = dist[cur] + 1 + dist_back[adj], cur
+                                child[cur] = adj  # Hook the two halves together.
+                        elif seen[adj] != stamp and is_safe(adj):
+                            seen[adj], dist[adj], parent[adj] = stamp, dist[cur] + 1, cur
+                            nxt.append(adj)
+                forward = nxt
+            else:
+                nxt = []
+                for cur in backward:
+                    expanded += 1
+                    for adj in neighbors[cur]:
+                        if seen[adj] == stamp:
+                            if dist[adj] + 1 + dist_back[cur] < best:
+                                best, meet = dist[adj] + 1 + dist_back[cur], adj
+                                child[adj] = cur
+                        elif seen_back[adj] != stamp and is_safe(adj):
+                            seen_back[adj], dist_back[adj], child[adj] = stamp, dist_back[cur] + 1, cur
+                            nxt.append(adj)
+                backward = nxt
+        self.__expanded = expanded
+        if meet < 0:
+            return deque()
+        path = self.__build_path(head, meet)
+        while meet != des:
+            path.append(m.direc_between(meet, child[meet]))
+            meet = child[meet]
+        return path
+
+    def jps_path_to(self, des):
+        """
+        Find the shortest path from the snake's head to the destination with jump point search,
+        the version for grids where you can only move orthogonally.
+        Instead of adding every cell to the open list, A* only stops at jump points:
+        cells where a straight run has to branch off, because a wall or body that was blocking the side
+        just ended, or (for vertical runs) where a horizontal run from there finds a jump point.
+        All the cells in between are skipped, because every path through them is just as long.
+        :param des: The destination position on the map of type Pos.
+        :return: A deque of instructions(directions) for the snake.
+        """
+        self.__stamp += 1
+        self.__search = stamp = self.__stamp
+        m, dist, parent, seen, closed = self.map, self.__dist, self.__parent, self.__seen, self.__closed
+        neighbors, cols = m.neighbors, m.num_cols
+        head, des = m.idx_of(self.snake.head()), m.idx_of(des)
+        des_x, des_y = divmod(des, cols)
+        dist[head], parent[head], seen[head] = 0, -1, stamp
+        head_x, head_y = divmod(head, cols)
+        heap = [(abs(head_x - des_x) + abs(head_y - des_y), 0, 0, head)]
+        pushed = expanded = 0
+        while heap:
+            cur = heapq.heappop(heap)[3]
+            if closed[cur] == stamp:
+                continue
+            closed[cur] = stamp
+            expanded += 1
+            if cur == des:
+                self.__expanded = expanded
+                return self.__build_jump_path(head, des)
+            if self.__past_deadline(expanded, 0):  # Every jump can scan a long way.
+                break
+            if cur == head:
+                ks = (0, 1, 2, 3)
+            else:
+                # Keep going the same way, or turn to either side. Never go back.
+                k = m.direc_between(parent[cur], self.__step_towards(parent[cur], cur)).value - 1
+                ks = (k, (k + 1) % 4, (k + 3) % 4)
+            for k in ks:
+                jump = self.__jump(cur, k, des)
+                if jump < 0 or closed[jump] == stamp:
+                    continue
+                jump_x, jump_y = divmod(jump, cols)
+                cur_x, cur_y = divmod(cur, cols)
+                jump_dist = dist[cur] + abs(jump_x - cur_x) + abs(jump_y - cur_y)
+                if seen[jump] != stamp or jump_dist < dist[jump]:
+                    seen[jump], dist[jump], parent[jump] = stamp, jump_dist, cur
+                    pushed += 1
+                    heapq.heappush(heap, (jump_dist + abs(jump_x - des_x) + abs(jump_y - des_y), -jump_dist,
+                                          pushed, jump))
+        self.__expanded = expanded
+        return deque()
+
+    def __jump(self, cur, k, des):
+        """
+        Runs straight from cur in one direction until it finds a jump point.
+        :param cur: The id of the cell to start from.
+        :param k: The direction to run in, as an index into the neighbour table (Direc.value - 1).
+        Even numbers are horizontal, odd numbers are vertical.
+        :param des: The id of the destination, which is always a jump point.
+        :return: The id of the jump point, or -1 if the run hits something first.
+        """
+        neighbors, is_safe = self.map.neighbors, self.map.is_safe_idx
+        side_a, side_b = (k + 1) % 4, (k + 3) % 4
+        prev, nxt = cur, neighbors[cur][k]
+        while True:
+            if not is_safe(nxt):
+                return -1
+            if nxt == des:
+                return nxt
+            # A forced neighbour: the side was blocked one cell back, but it's open here.
+            if (is_safe(neighbors[nxt][side_a]) and not is_safe(neighbors[prev][side_a])) or \
+                    (is_safe(neighbors[nxt][side_b]) and not is_safe(neighbors[prev][side_b])):
+                return nxt
+            if k % 2 == 1 and self.__past_deadline(0, 0):
+                return -1  # A vertical run scans a whole row each step, so it keeps an eye on the clock too.
+            if k % 2 == 1 and (self.__jump(nxt, side_a, des) >= 0 or self.__jump(nxt, side_b, des) >= 0):
+                # Running vertically, and a horizontal run from here finds something.
+                return nxt
+            prev, nxt = nxt, neighbors[nxt][k]
+
+    def __step_towards(self, src, des):
+        """
+        :param src: The id of a cell.
+        :param des: The id of another cell in the same row or column.
+        :return: The id of the cell next to src, on the way to des.
+        """
+        if src // self.map.num_cols == des // self.map.num_cols:
+            return src + (1 if des > src else -1)
+        return src + (self.map.num_cols if des > src else -self.map.num_cols)
+
+    def __build_jump_path(self, src, des):
+        """
+        Build a path from the source from the destination, going in a straight line between jump points.
+        :param src: The id of the starting cell.
+        :param des: The id of the destination.
+        :return: A path of deque. Each item in the deque is a Direc.
+        """
+        path = deque()
+        tmp = des
+        while tmp != src:
+            parent = self.__parent[tmp]
+            direc = self.map.direc_between(parent, self.__step_towards(parent, tmp))
+            cols = self.map.num_cols
+            steps = abs(tmp // cols - parent // cols) + abs(tmp % cols - parent % cols)
+            path.extendleft([direc] * steps)
+            tmp = parent
+        return path
+
+    def hierarchical_path_to(self, des):
+        """
+        Find a path from the snake's head to the destination over the clusters of the map (HPA*), see ClusterGraph.
+        The clusters are kept up to date as the snake moves, so only the ones that changed are looked at again.
+        The path might be a few steps longer than the shortest one, but it's there whenever a path is there at all.
+        Since it isn't always the shortest, a new path every tick could take the snake one step back for every step
+        forward, forever. So once there's a path, the snake sticks to it for as long as it is following it
+        to the same destination and nothing has moved into the way.
+        :param des: The destination position on the map of type Pos.
+        :return: A deque of instructions(directions) for the snake.
+        """
+        m = self.map
+        if self.__clusters is None:
+            self.__clusters = ClusterGraph(m, self.__cluster_size)
+        head, des = m.idx_of(self.snake.head()), m.idx_of(des)
+        plan = self.__plan
+        if len(plan) > 2 and plan[1] == head and plan[-1] == des and all(map(m.is_safe_idx, plan[2:])):
+            plan = plan[1:]
+            self.__expanded = 0
+        else:
+            plan = [head] + self.__clusters.path(head, des)
+            self.__expanded = self.__clusters.expanded
+        self.__plan = plan
+        path = deque()
+        for cur, nxt in zip(plan, plan[1:]):
+            path.append(m.direc_between(cur, nxt))
+        return path
+
+    def longest_path_to(self, des, path=None):
         """
         Find the longest path from the snake's head to the destination.
         This is done by getting the shortest path,
         then extending the path by pushing it out.
+        The path is kept as a linked list of cell ids (__next points to the next cell on the path),
+        so pushing out a piece of the path is just splicing two cells in, no matter how long the path is.
         :param des: THe destination position on the map of type Pos.
+        :param path: The shortest path to the destination, if it's already known (from paths_to_many, say).
+        It is the starting point for the pushing out. Otherwise, it is searched for here.
         :return: A deque of instructions(directions) for the snake.
         """
-        path = self.shortest_path_to(des)
+        if path is None:
+            path = self.shortest_path_to(des)
         if not path:  # If you can't even get there, then return an empty deque.
             return deque()
-        self.__reset_table()  # Ensure idempotency.
-        cur = head = self.snake.head()
-        # Set all positions on the shortest path to visited.
-        self.__table[cur.x][cur.y].visit = True
+        self.__stamp += 1  # A fresh stamp, so that nothing is visited yet.
+        m, stamp, visit, nxt_of = self.map, self.__stamp, self.__visit, self.__next
+        neighbors, is_safe = m.neighbors, m.is_safe_idx
+        cur = head = m.idx_of(self.snake.head())
+        # Set all positions on the shortest path to visited, and link them up.
+        visit[cur] = stamp
         for direc in path:
-            cur = cur.adj(direc)
-            self.__table[cur.x][cur.y].visit = True
-        idx, cur = 0, head
-        while True:
-            cur_direc = path[idx]
-            nxt = cur.adj(cur_direc)
-            tests = []
+            nxt = neighbors[cur][direc.value - 1]
+            nxt_of[cur] = nxt
+            visit[nxt] = stamp
+            cur = nxt
+        des = cur
+        nxt_of[des] = -1
+        cur = head
+        count = 0
+        while cur != des:
+            count += 1
+            if self.__past_deadline(count):
+                break  # Whatever has been pushed out so far is still a path to the destination.
+            nxt = nxt_of[cur]
             # We create a next because we need to push out two "blocks" at once.
             # How this works is the algorithm checks two adjacent points,
             # and sees if they can be pushed out in the opposite direction.
-            if cur_direc == Direc.LEFT or cur_direc == Direc.RIGHT:
-                tests = [Direc.UP, Direc.DOWN]
-                # Then we can try extending the path up or down.
-            elif cur_direc == Direc.UP or cur_direc == Direc.DOWN:
-                tests = [Direc.LEFT, Direc.RIGHT]
-                # If the direction is moving up, then we try pushing it out sideways..
-            extended = False
-            for test_direc in tests:
-                cur_test = cur.adj(test_direc)
-                nxt_test = nxt.adj(test_direc)
-                if self.__is_valid(cur_test) and self.__is_valid(nxt_test):
-                    self.__table[cur_test.x][cur_test.y].visit = True
-                    self.__table[nxt_test.x][nxt_test.y].visit = True
-                    path.insert(idx, test_direc)  # We will insert that anti-shortcut into the path.
-                    path.insert(idx + 2, Direc.opposite(test_direc))  # What goes out must eventually come back.
-                    extended = True  # This tells the algorithm to continue checking that same point.
-                    break
-            if not extended:  # If there was no pushing out the path, then continue to the next point.
+            if nxt - cur == 1 or cur - nxt == 1:
+                tests = (1, 3)
+                # If the path goes left or right, then we can try extending the path up or down.
+            else:
+                tests = (0, 2)
+                # If the path goes up or down, then we try pushing it out sideways.
+            for k in tests:
+                cur_test = neighbors[cur][k]
+                nxt_test = neighbors[nxt][k]
+                if visit[cur_test] != stamp and is_safe(cur_test) and visit[nxt_test] != stamp and is_safe(nxt_test):
+                    visit[cur_test] = stamp
+                    visit[nxt_test] = stamp
+                    # Splice the anti-shortcut into the path. What goes out must eventually come back.
+                    nxt_of[cur], nxt_of[cur_test], nxt_of[nxt_test] = cur_test, nxt_test, nxt
+                    break  # Check that same point again, with its new next point.
+            else:  # If there was no pushing out the path, then continue to the next point.
                 cur = nxt
-                idx += 1
-                if idx >= len(path):
-                    # Once all points have been checked, then break out of the loop and return the path.
-                    break
+        path = deque()
+        cur = head
+        while cur != des:
+            path.append(m.direc_between(cur, nxt_of[cur]))
+            cur = nxt_of[cur]
         return path
 
-    def __reset_table(self):
+    def distance_field(self, src=None, use_numpy=True):
+        """
+        Finds the distance from src to every cell on the map at once, going only through empty cells and food.
+        src itself doesn't have to be free, so this works from the head, and from the food as well.
+        With NumPy, the whole frontier is pushed out by one step at a time, by shifting a mask of it
+        by 1 (left and right) and by num_cols (up and down) over the map's cells.
+        The border of the map is all walls, so shifting never wraps around from one row to the next.
+        Without NumPy (or with use_numpy off), it's a plain BFS on the cell ids.
+        :param src: The starting position, of type Pos. Defaults to the snake's head.
+        :param use_numpy: Whether to use NumPy if it is installed.
+        :return: The distances, indexed by cell id (see Map.idx_of). -1 means the cell can't be reached.
+        This is a NumPy array of int64 with NumPy, and a list otherwise.
+        """
+        m = self.map
+        src = m.idx_of(self.snake.head() if src is None else src)
+        if np is not None and use_numpy:
+            return self.__numpy_distance_field(src)
+        dist = [-1] * len(m.cells)
+        dist[src] = 0
+        neighbors, is_safe = m.neighbors, m.is_safe_idx
+        queue = deque()
+        queue.append(src)
+        while queue:
+            cur = queue.popleft()
+            adj_dist = dist[cur] + 1
+            for adj in neighbors[cur]:
+                if dist[adj] < 0 and is_safe(adj):
+                    dist[adj] = adj_dist
+                    queue.append(adj)
+        return dist
+
+    def __numpy_distance_field(self, src):
         """
-        Reset the table for a new round of testing.
-        This is done by calling the reset function for each cell,
-        which deletes their parents (shocking, I know), and sets their visit to false.
-        :return: Void.
+        The NumPy engine of distance_field.
+        :param src: The id of the starting cell.
+        :return: A NumPy array of the distances, with -1 for cells that can't be reached.
         """
-        for row in self.__table:
-            for col in row:
-                col.reset()
+        cells = np.frombuffer(self.map.cells, dtype=np.uint8)
+        free = (cells == PointType.EMPTY.value) | (cells == PointType.FOOD.value)
+        cols = self.map.num_cols
+        dist = np.full(cells.shape, -1, dtype=np.int64)
+        dist[src] = 0
+        free[src] = False  # Don't come back to the start.
+        frontier = np.zeros(cells.shape, dtype=bool)
+        frontier[src] = True
+        grown = np.empty_like(frontier)
+        d = 0
+        while True:
+            grown[0] = False
+            grown[1:] = frontier[:-1]  # Right
+            grown[:-1] |= frontier[1:]  # Left
+            grown[cols:] |= frontier[:-cols]  # Down
+            grown[:-cols] |= frontier[cols:]  # Up
+            grown &= free
+            if not grown.any():
+                return dist
+            d += 1
+            dist[grown] = d
+            free ^= grown  # The new frontier was free, and now it's been visited.
+            frontier, grown = grown, frontier
 
     def __build_path(self, src, des):
         """
         Build a path from the source from the destination, using the records of parent.
-        :param src: The starting point. Usually the snake's head.
-        :param des: The destination. Usually the food for Greedy,
+        :param src: The id of the starting cell. Usually the snake's head.
+        :param des: The id of the destination. Usually the food for Greedy,
         and the snake's tail for Hamiltonian Cycle.
         :return: A path of deque, tracing the path to get there. Each item in the deque is a Direc.
         """
         path = deque()
         tmp = des
         while tmp != src:
-            parent = self.__table[tmp.x][tmp.y].parent
-            path.appendleft(parent.direction_to(tmp))
+            parent = self.__parent[tmp]
+            path.appendleft(self.map.direc_between(parent, tmp))
             tmp = parent
         return path
-
-    def __is_valid(self, pos):
-        """
-        This function checks if that point is valid.
-        The two conditions that it checks is if the point has been visited before,
-        and if it is safe, aka within the boundaries of the map and not a snake body.
-        :param pos: A position of type Pos.
-        :return: A boolean value, depending on if that position is valid or not.
-        """
-        return not self.__table[pos.x][pos.y].visit and self.map.is_safe(pos)
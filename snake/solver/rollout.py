@@ -0,0 +1,283 @@
+# coding=utf-8
+"""
+Definitions for RolloutSolver.
+This snake doesn't plan at all. For every move it could make, it just plays the game forward a bunch of times,
+with quick and sloppy moves, and sees how it goes. The move whose games went best wins.
+The games (rollouts) are all played at once, as one batch of NumPy arrays, one row per rollout:
+Entered:    The step at which the head last entered each cell. A cell is taken by the body if the head entered it
+            less than the snake's length steps ago, so moving the snake only takes writing down one number,
+            just like Snake does it.
+Head:       The cell the head is in.
+Length:     How long the snake is.
+Food:       The cell the food is in, or -1 if there's no more room for any.
+Each step, every rollout picks one of its safe moves at random. With a greedy bias, the moves that get closer
+to the food are more likely. A rollout without a safe move is dead, and stays dead.
+A rollout scores a point for every step it survives, and food_value points for every food it eats.
+NumPy is needed for this one, so unlike the rest of the solvers, it won't run without it.
+With a pool (see BaseSolver.start_pool), the rollouts for each move are played by a different worker.
+"""
+import time
+
+from snake.map import PointType
+from snake.solver.base import BaseSolver
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, but not for this solver.
+    np = None
+
+
+_worker_solvers = {}
+# The solvers of a worker process, one per map size, so that the neighbour table is only built once.
+
+
+def _rollouts_in_worker(snake, direc, num_rollouts, depth, greedy_bias, food_value, budget_ms, seed):
+    """
+    Plays the rollouts for one move in a worker process. See RolloutSolver.score_move.
+    The worker's solver is reseeded every time, with the seed of the tick and the move, so that it doesn't matter
+    which worker gets which move, or what the worker played before.
+    :return: The average score, whether every rollout got to go all the way,
+    and the number of rollouts started and of steps played.
+    """
+    key = (snake.map.num_rows, snake.map.num_cols)
+    solver = _worker_solvers.get(key)
+    if solver is None:
+        solver = _worker_solvers[key] = RolloutSolver(snake)
+    solver.snake = snake
+    solver.num_rollouts, solver.depth = num_rollouts, depth
+    solver.greedy_bias, solver.food_value = greedy_bias, food_value
+    return solver.score_move(direc, budget_ms, seed=(seed, direc.value))
+
+
+class RolloutSolver(BaseSolver):
+    """    A snake that tries everything a few hundred times, and hopes for the best.    """
+
+    def __init__(self, snake, num_rollouts=256, depth=40, greedy_bias=2.0, food_value=None, seed=None):
+        """
+        :param snake: The snake to steer.
+        :param num_rollouts: How many rollouts to play for each move. More is better, and slower.
+        :param depth: How many steps each rollout goes on for, at most. Longer is better, and slower.
+        :param greedy_bias: How much more likely a move towards the food is than any other. 0 means purely random.
+        :param food_value: How many points a food is worth, in steps survived. Defaults to a quarter of depth.
+        :param seed: The seed for the rollouts' random numbers, so that games can be played again.
+        """
+        if np is None:
+            raise ImportError('RolloutSolver needs NumPy.')
+        if num_rollouts < 1 or depth < 1:
+            raise ValueError('\'num_rollouts\' and \'depth\' must be at least 1.')
+        super().__init__(snake)
+        self.__num_rollouts = num_rollouts
+        self.__depth = depth
+        self.__greedy_bias = greedy_bias
+        self.__food_value = depth / 4 if food_value is None else food_value
+        self.__rng = np.random.default_rng(seed)
+        m = snake.map
+        self.__neighbors = np.array(m.neighbors, dtype=np.int64)
+        self.__cols = m.num_cols
+        self.__scores = []
+        self.__total_rollouts = 0
+        self.__total_steps = 0
+        self.__total_time = 0.0
+
+    @property
+    def num_rollouts(self):
+        """
+        :return: How many rollouts are played for each move.
+        """
+        return self.__num_rollouts
+
+    @num_rollouts.setter
+    def num_rollouts(self, val):
+        self.__num_rollouts = val
+
+    @property
+    def depth(self):
+        """
+        :return: How many steps each rollout goes on for, at most.
+        """
+        return self.__depth
+
+    @depth.setter
+    def depth(self, val):
+        self.__depth = val
+
+    @property
+    def greedy_bias(self):
+        """
+        :return: How much more likely a move towards the food is than any other.
+        """
+        return self.__greedy_bias
+
+    @greedy_bias.setter
+    def greedy_bias(self, val):
+        self.__greedy_bias = val
+
+    @property
+    def food_value(self):
+        """
+        :return: How many points a food is worth, in steps survived.
+        """
+        return self.__food_value
+
+    @food_value.setter
+    def food_value(self, val):
+        self.__food_value = val
+
+    @property
+    def scores(self):
+        """
+        :return: The average score of each move on the last tick, as a dict of Direc -> score.
+        """
+        return dict(self.__scores)
+
+    @property
+    def rollouts_per_sec(self):
+        """
+        :return: The number of rollouts played per second, over every tick so far. This is the one to tune.
+        A rollout counts once it has started, before the deadline, however early it dies or gets cut short.
+        """
+        return self.__total_rollouts / self.__total_time if self.__total_time else 0.0
+
+    @property
+    def steps_per_sec(self):
+        """
+        :return: The number of rollout steps played per second, over every tick so far.
+        Unlike rollouts_per_sec, this one notices rollouts that die early or get cut short by the deadline.
+        """
+        return self.__total_steps / self.__total_time if self.__total_time else 0.0
+
+    def next_direc(self, budget_ms=None):
+        """
+        Plays num_rollouts rollouts for each safe move, and goes with the move with the best average score.
+        If there's a tie, the snake keeps going the way it's going.
+        :param budget_ms: How many milliseconds this may take. The rollouts are cut short (and scored as they are)
+        once the time is up. None means depth steps, however long that takes.
+        :return: A direction of type Direc.
+        """
+        self.start_tick(budget_ms)
+        start = time.perf_counter()
+        m, snake = self.map, self.snake
+        head = m.idx_of(snake.head())
+        moves = [(k, direc) for k, direc in enumerate(m.ADJ_DIRECS) if m.is_safe_idx(m.neighbors[head][k])]
+        self.__scores = []
+        if len(moves) <= 1:  # Nothing to think about.
+            self.end_tick()
+            return moves[0][1] if moves else snake.direc
+        if self.parallel:
+            # The workers don't share the random numbers, so each tick draws a seed for them from this one.
+            seed = int(self.__rng.integers(1 << 62))
+            left_ms = None if self.deadline is None else max(0.0, 1000 * (self.deadline - time.perf_counter()))
+            results = self.score_moves(_rollouts_in_worker, [direc for _, direc in moves], self.__num_rollouts,
+                                       self.__depth, self.__greedy_bias, self.__food_value, left_ms, seed)
+            scores = [score for score, _, _, _ in results]
+            completed = all(done for _, done, _, _ in results)
+            started = sum(count for _, _, count, _ in results)
+            played = sum(count for _, _, _, count in results)
+        else:
+            scores, completed, started, played = self.__rollouts([k for k, _ in moves])
+        self.report('rollouts', completed)
+        self.__scores = [(direc, score) for (_, direc), score in zip(moves, scores)]
+        best = max(scores)
+        choices = [direc for direc, score in self.__scores if score == best]
+        self.__total_rollouts += started
+        self.__total_steps += played
+        self.__total_time += time.perf_counter() - start
+        self.end_tick()
+        return snake.direc if snake.direc in choices else choices[0]
+
+    def score_move(self, direc, budget_ms=None, seed=None):
+        """
+        Plays the rollouts for a single move. This is what the workers do.
+        :param direc: The direction to move in. It has to be safe.
+        :param budget_ms: How many milliseconds this may take. None means as long as it takes.
+        :param seed: If given, the random numbers start over from this seed first.
+        :return: The average score, whether every rollout got to go all the way,
+        and the number of rollouts started and of steps played.
+        """
+        if seed is not None:
+            self.__rng = np.random.default_rng(seed)
+        self.start_tick(budget_ms)
+        scores, completed, started, played = self.__rollouts([direc.value - 1])
+        self.end_tick()
+        return scores[0], completed, started, played
+
+    def __rollouts(self, first_moves):
+        """
+        Plays all the rollouts for all the moves, as one batch.
+        :param first_moves: The first move of each group of rollouts, as an index into the neighbour table.
+        :return: The average score of each group, whether every rollout got to go all the way,
+        the number of rollouts that got to start (the first step is always played, so that's all of them),
+        and the number of steps played, by all the rollouts put together.
+        """
+        m, snake, rng = self.map, self.snake, self.__rng
+        neighbors, cols = self.__neighbors, self.__cols
+        num_cells = len(m.cells)
+        n = self.__num_rollouts * len(first_moves)
+        rows = np.arange(n)
+
+        # Set up the batch, every row a copy of the real game.
+        steps = snake.steps
+        entered = np.empty(num_cells, dtype=np.int64)
+        entered.fill(-num_cells - 1)  # Long enough ago to be free, however long the snake gets.
+        for i in range(snake.len()):
+            entered[snake.body_idx(i)] = steps - i
+        entered = np.tile(entered, (n, 1))
+        walls = np.frombuffer(m.cells, dtype=np.uint8) == PointType.WALL.value
+        head = np.full(n, m.idx_of(snake.head()), dtype=np.int64)
+        length = np.full(n, snake.len(), dtype=np.int64)
+        food = np.full(n, m.idx_of(m.food) if m.food is not None else -1, dtype=np.int64)
+        alive = np.ones(n, dtype=bool)
+        survived = np.zeros(n, dtype=np.int64)
+        eaten = np.zeros(n, dtype=np.int64)
+        forced = np.repeat(np.array(first_moves, dtype=np.int64), self.__num_rollouts)
+
+        completed = True
+        for step in range(self.__depth):
+            if step and not self.time_left():
+                completed = False
+                break
+            live = rows[alive]
+            if not len(live):
+                break
+            cur = head[live]
+            adj = neighbors[cur]  # Every rollout's four neighbours.
+            if step == 0:
+                choice = forced[live]  # Already known to be safe.
+            else:
+                age = steps - entered[live[:, None], adj]
+                weights = (~walls[adj] & (age >= length[live, None])).astype(np.float64)
+                if self.__greedy_bias:
+                    fx, fy = np.divmod(food[live], cols)
+                    hx, hy = np.divmod(cur, cols)
+                    ax, ay = np.divmod(adj, cols)
+                    closer = (np.abs(ax - fx[:, None]) + np.abs(ay - fy[:, None]) <
+                              (np.abs(hx - fx) + np.abs(hy - fy))[:, None]) & (food[live, None] >= 0)
+                    weights += weights * closer * self.__greedy_bias
+                total = weights.sum(axis=1)
+                stuck = total == 0
+                # Pick a move with a chance proportional to its weight.
+                pick = rng.random(len(live)) * total
+                choice = np.minimum((np.cumsum(weights, axis=1) <= pick[:, None]).sum(axis=1), 3)
+                if stuck.any():
+                    alive[live[stuck]] = False
+                    live, cur, adj, choice = live[~stuck], cur[~stuck], adj[~stuck], choice[~stuck]
+                    if not len(live):
+                        break
+            steps += 1
+            nxt = adj[np.arange(len(live)), choice]
+            entered[live, nxt] = steps
+            head[live] = nxt
+            survived[live] += 1
+            ate = live[nxt == food[live]]
+            if len(ate):
+                length[ate] += 1
+                eaten[ate] += 1
+                # New food, in a random free cell.
+                free = ~walls & (steps - entered[ate] >= length[ate, None])
+                pick = rng.random(free.shape) * free
+                spot = pick.argmax(axis=1)
+                food[ate] = np.where(pick[np.arange(len(ate)), spot] > 0, spot, -1)
+
+        scores = survived + self.__food_value * eaten
+        mean = scores.reshape(len(first_moves), self.__num_rollouts).mean(axis=1).tolist()
+        return mean, completed, int(np.count_nonzero(survived)), int(survived.sum())
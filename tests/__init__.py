@@ -1,2 +1,29 @@
 # coding=utf-8
-""" Init file."""
+""" Init file, and a few helpers that more than one test needs."""
+import random
+
+from snake.map import PointType
+
+
+def random_empty(m):
+    """
+    :param m: The map, of type Map.
+    :return: A random empty cell of the map, as a Pos.
+    """
+    return m.pos_of(random.choice([i for i, c in enumerate(m.cells) if c == PointType.EMPTY.value]))
+
+
+def check_path(m, s, des, path):
+    """
+    Follows a path from the snake's head, to make sure it's real: it only goes over safe cells, and ends up on des.
+    :param m: The map, of type Map.
+    :param s: The snake, of type Snake.
+    :param des: Where the path should end up, of type Pos.
+    :param path: The path, an iterable of directions.
+    :return: Void.
+    """
+    cur = s.head()
+    for direc in path:
+        cur = cur.adj(direc)
+        assert cur == des or m.is_safe(cur)
+    assert cur == des
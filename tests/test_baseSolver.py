@@ -0,0 +1,77 @@
+# coding=utf-8
+"""
+Tests for the things every solver gets from BaseSolver: the clock, and the pool of workers.
+The pool has to give the exact same scores as scoring the moves one after the other.
+"""
+import random
+from unittest import TestCase
+
+import pytest
+
+from snake.map import Map, Snake, Direc, Pos, PointType
+from snake.solver import LookaheadSolver
+from snake.solver.base import BaseSolver
+
+
+def _room_after(snake, direc, bonus):
+    """
+    A scorer that moves the snake, counts the free cells around the head, and takes the move back.
+    """
+    record = snake.apply(direc)
+    head = snake.head()
+    score = sum(snake.map.is_safe(adj) for adj in head.all_adj()) + bonus
+    snake.undo(record)
+    return score, snake.steps
+
+
+class TestBaseSolver(TestCase):
+    def test_score_moves(self):
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        m.point(Pos(1, 5)).type = PointType.WALL
+        solver = BaseSolver(s)
+        direcs = [Direc.RIGHT, Direc.DOWN]
+        serial = solver.score_moves(_room_after, direcs, 10)
+        assert serial == [(11, 0), (13, 0)]
+        assert not solver.parallel
+        before = bytes(m.cells)
+        solver.start_pool(0, workers=2)
+        try:
+            assert solver.parallel
+            assert solver.score_moves(_room_after, direcs, 10) == serial
+        finally:
+            solver.close_pool()
+        assert not solver.parallel
+        assert bytes(m.cells) == before
+        # A map that's too small for the pool is scored right here.
+        solver.start_pool(m.capacity + 1, workers=2)
+        try:
+            assert not solver.parallel
+            assert solver.score_moves(_room_after, direcs, 10) == serial
+        finally:
+            solver.close_pool()
+        # Asking for a pool that would never be used is a mistake, not a quiet way to score everything right here.
+        with pytest.raises(ValueError):
+            solver.start_pool(None)
+        assert not solver.parallel
+
+    def test_lookahead_pool(self):
+        random.seed(25)
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        serial, pooled = LookaheadSolver(s, max_depth=3), LookaheadSolver(s, max_depth=3)
+        pooled.start_pool(0, workers=2)
+        try:
+            for _ in range(30):
+                if not m.has_food():
+                    m.create_rand_food()
+                direc = serial.next_direc()
+                assert pooled.next_direc() == direc
+                assert pooled.depth == serial.depth
+                s.move(direc)
+        finally:
+            pooled.close_pool()
@@ -0,0 +1,57 @@
+# coding=utf-8
+"""
+Tests for the Bitboard.
+We check the flood fill against what the snake has walled off,
+and that the bitboard keeps up with the snake as it moves.
+"""
+from unittest import TestCase
+
+from snake.map import Map, Snake, Direc, Pos, PointType, Bitboard
+
+
+def _region_size(m, src):
+    """
+    Plain BFS, to check the bitboard against.
+    """
+    seen, queue = {src}, [src]
+    while queue:
+        cur = queue.pop()
+        for adj in cur.all_adj():
+            if adj not in seen and m.is_safe(adj):
+                seen.add(adj)
+                queue.append(adj)
+    return len(seen) - (0 if m.is_safe(src) else 1)
+
+
+class TestBitboard(TestCase):
+    def test_regions(self):
+        m = Map(7, 7)
+        # A snake cutting the map into a left and a right part.
+        s = Snake(m, Direc.DOWN,
+                  [Pos(5, 3), Pos(4, 3), Pos(3, 3), Pos(2, 3), Pos(1, 3)],
+                  [PointType.HEAD_D, PointType.BODY_VER, PointType.BODY_VER, PointType.BODY_VER,
+                   PointType.BODY_VER])
+        b = Bitboard(m)
+        assert b.region_size(Pos(1, 1)) == 10
+        assert b.region_size(Pos(5, 5)) == 10
+        assert b.region_size(s.head()) == 20
+        assert not b.is_connected(Pos(1, 1), Pos(1, 5))
+        assert b.is_connected(s.head(), s.tail())
+        assert b.is_connected(Pos(1, 1), s.tail())
+
+    def test_sync(self):
+        m = Map(6, 6)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        b = Bitboard(m)
+        m.create_food(Pos(2, 2))
+        for direc in [Direc.DOWN, Direc.LEFT, Direc.DOWN, Direc.RIGHT, Direc.RIGHT]:
+            s.move(direc)
+            for pos in [Pos(4, 4), Pos(1, 1), s.head()]:
+                assert b.region_size(pos) == _region_size(m, pos)
+        m.reset()
+        assert b.region_size(Pos(1, 1)) == m.capacity
+        b.detach()
+        m.point(Pos(1, 1)).type = PointType.WALL
+        assert b.region_size(Pos(1, 1)) == m.capacity
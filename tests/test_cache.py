@@ -0,0 +1,36 @@
+# coding=utf-8
+"""
+Tests for the transposition cache.
+We make sure that it remembers what it's told, and that it forgets the oldest entries first once it is full.
+"""
+from unittest import TestCase
+
+import pytest
+
+from snake.solver import TranspositionCache
+
+
+class TestTranspositionCache(TestCase):
+    def test_get_put(self):
+        cache = TranspositionCache()
+        assert cache.get(1) is None and cache.misses == 1
+        cache.put(1, 'a')
+        assert 1 in cache and cache.get(1) == 'a' and cache.hits == 1
+        cache.put(1, 'b')
+        assert len(cache) == 1 and cache.get(1) == 'b'
+        cache.clear()
+        assert len(cache) == 0 and cache.memory == 0
+        with pytest.raises(ValueError):
+            _ = TranspositionCache(0)
+
+    def test_eviction(self):
+        cache = TranspositionCache(1000)
+        for key in range(100):
+            cache.put(key, key)
+            assert cache.memory <= cache.max_bytes
+        assert 0 < len(cache) < 100
+        assert 99 in cache and 0 not in cache
+        oldest = 100 - len(cache)
+        cache.get(oldest)  # Using an entry makes it new again.
+        cache.put(100, 100)
+        assert oldest in cache and oldest + 1 not in cache
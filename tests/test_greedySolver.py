@@ -0,0 +1,99 @@
+# coding=utf-8
+"""
+Tests for the greedy little snake.
+Mostly about it sticking to its plans, and dropping them when it should.
+And about it not running away into a pocket it can't get out of.
+"""
+import random
+from unittest import TestCase
+
+from snake.map import Map, Snake, Direc, Pos, PointType
+from snake.solver import GreedySolver, PathSolver
+
+
+class TestGreedySolver(TestCase):
+    def test_plan(self):
+        random.seed(21)
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        m.create_food(Pos(5, 5))
+        solver = GreedySolver(s)
+        path = PathSolver(s).path_to(m.food, 'shortest')
+        # The first direction commits to a path to the food, and the snake follows it until the food is eaten.
+        for _ in range(len(path)):
+            s.move(solver.next_direc())
+        assert s.head() == Pos(5, 5)
+        assert s.len() == 4
+        # The food moved, so the next plan is a new one, and it goes for the new food.
+        m.create_food(Pos(1, 6))
+        direc = solver.next_direc()
+        assert Pos.manhattan_distance(s.head().adj(direc), m.food) < Pos.manhattan_distance(s.head(), m.food)
+
+    def test_deviation(self):
+        random.seed(22)
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        m.create_food(Pos(6, 6))
+        solver = GreedySolver(s)
+        s.move(solver.next_direc())
+        # Go somewhere else than the plan says. The plan is dropped, and the next direction is worked out again.
+        planned = solver.next_direc()
+        s.move(next(d for d in (Direc.LEFT, Direc.UP, Direc.RIGHT, Direc.DOWN)
+                    if d != planned and m.is_safe(s.head().adj(d))))
+        for _ in range(30):
+            if not m.has_food():
+                m.create_rand_food()
+            direc = solver.next_direc()
+            assert m.is_safe(s.head().adj(direc))
+            s.move(direc)
+
+    def test_budget(self):
+        random.seed(23)
+        m = Map(12, 12)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        solver = GreedySolver(s, commit_plans=False)
+        # No time at all. Every phase gets cut, but the snake still has to go somewhere safe.
+        for _ in range(50):
+            if not m.has_food():
+                m.create_rand_food()
+            direc = solver.next_direc(0)
+            assert m.is_safe(s.head().adj(direc))
+            s.move(direc)
+        stats = solver.stats
+        assert stats.ticks == 50
+        assert stats.phases['food'] == [0, 50]
+        assert stats.phases['escape'] == [0, 50]
+        assert stats.overruns == 50
+        # All the time in the world. Nothing gets cut.
+        direc = solver.next_direc(1000)
+        assert m.is_safe(s.head().adj(direc))
+        assert solver.stats.ticks == 51
+        assert solver.stats.last['food']
+        assert solver.stats.overruns == 50
+
+    def test_escape(self):
+        random.seed(20)
+        m = Map(8, 8)
+        s = Snake(m, Direc.UP,
+                  [Pos(3, 3), Pos(4, 3), Pos(5, 3)],
+                  [PointType.HEAD_U, PointType.BODY_VER, PointType.BODY_VER])
+        # The tail and the food are both walled in, so there's no getting to either, and it's all down to step 5.
+        # To the left of the head is a dead end, and to the right is the rest of the map.
+        for pos in (Pos(5, 2), Pos(5, 4), Pos(6, 3), Pos(1, 5), Pos(2, 6),
+                    Pos(2, 3), Pos(2, 2), Pos(4, 2), Pos(3, 1)):
+            m.point(pos).type = PointType.WALL
+        m.create_food(Pos(1, 6))
+        head = s.head()
+        # Running as far from the food as possible, the way step 5 used to, means the dead end.
+        moves = [adj for adj in head.all_adj() if m.is_safe(adj)]
+        assert max(moves, key=lambda adj: Pos.manhattan_distance(adj, m.food)) == Pos(3, 2)
+        solver = GreedySolver(s)
+        direc = solver.next_direc()
+        assert solver.stats.last['escape']
+        assert direc == Direc.RIGHT
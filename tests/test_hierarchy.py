@@ -0,0 +1,72 @@
+# coding=utf-8
+"""
+Tests for ClusterGraph and the hierarchical paths of PathSolver.
+"""
+import random
+from unittest import TestCase
+
+from snake.map import Direc, Pos, PointType, Map, Snake
+from snake.solver import PathSolver, ClusterGraph
+from tests import random_empty, check_path
+
+
+class TestClusterGraph(TestCase):
+    def test_paths(self):
+        random.seed(18)
+        for _ in range(30):
+            m = Map(26, 26)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR])
+            for _ in range(random.randint(0, 250)):
+                m.point(random_empty(m)).type = PointType.WALL
+            solver = PathSolver(s, cluster_size=random.randint(2, 9))
+            for _ in range(5):
+                des = random_empty(m)
+                path = solver.path_to(des, 'hierarchical')
+                shortest = solver.path_to(des, 'shortest')
+                assert bool(path) == bool(shortest)  # Found whenever there's a path at all.
+                if path:
+                    assert len(path) >= len(shortest)
+                    check_path(m, s, des, path)
+
+    def test_updates(self):
+        random.seed(19)
+        m = Map(34, 34)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        for _ in range(150):
+            m.point(random_empty(m)).type = PointType.WALL
+        solver = PathSolver(s, cluster_size=8)
+        for _ in range(200):
+            if not m.has_food():
+                m.create_food(random_empty(m))
+            path = solver.path_to(m.food, 'hierarchical')
+            assert bool(path) == bool(solver.path_to(m.food, 'shortest'))
+            if path:
+                check_path(m, s, m.food, path)
+            direcs = [d for d in (Direc.LEFT, Direc.UP, Direc.RIGHT, Direc.DOWN) if m.is_safe(s.head().adj(d))]
+            if not direcs:
+                break
+            s.move(path[0] if path else random.choice(direcs))
+        # Cells that are changed and put back again don't make anything get rebuilt.
+        graph = ClusterGraph(m, 8)
+        graph.update()
+        records = [s.apply(direc) for direc in solver.path_to(m.food, 'hierarchical')]
+        for record in reversed(records):
+            s.undo(record)
+        assert graph.update() == 0
+        graph.detach()
+
+    def test_food_engine(self):
+        m = Map(40, 40)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        solver = PathSolver(s, 'hierarchical', jps_fraction=0, cluster_size=5)
+        m.create_food(Pos(30, 30))
+        assert solver.food_engine == 'hierarchical'
+        m.rm_food()
+        m.create_food(Pos(3, 4))
+        assert solver.food_engine == 'shortest'  # Close enough for the exact path.
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""
+Tests for IncrementalDistanceField.
+Every repaired field is checked against a full BFS from the food.
+"""
+import random
+from unittest import TestCase
+
+from snake.map import Direc, Pos, PointType, Map, Snake
+from snake.solver import PathSolver, IncrementalDistanceField
+from tests import random_empty
+
+
+def _random_move(m, s):
+    direcs = [d for d in (Direc.LEFT, Direc.UP, Direc.RIGHT, Direc.DOWN) if m.is_safe(s.head().adj(d))]
+    return random.choice(direcs) if direcs else None
+
+
+class TestIncrementalDistanceField(TestCase):
+    def test_against_bfs(self):
+        random.seed(17)
+        for _ in range(20):
+            m = Map(12, 12)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR])
+            for _ in range(random.randint(0, 15)):
+                m.point(random_empty(m)).type = PointType.WALL
+            field = IncrementalDistanceField(m)
+            solver = PathSolver(s)
+            for _ in range(150):
+                if not m.has_food():
+                    m.create_food(random_empty(m))
+                assert field.field == solver.distance_field(m.food, use_numpy=False)
+                direc = _random_move(m, s)
+                if direc is None:
+                    break
+                s.move(direc)
+            field.detach()
+
+    def test_lazy_batches(self):
+        random.seed(18)
+        m = Map(10, 10)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        m.create_food(Pos(8, 8))
+        field = IncrementalDistanceField(m)
+        solver = PathSolver(s)
+        for _ in range(30):
+            # A few moves that are taken back again, and a few that aren't, all between two looks at the field.
+            records = []
+            for _ in range(random.randint(1, 5)):
+                direc = _random_move(m, s)
+                if direc is None:
+                    break
+                records.append(s.apply(direc))
+            for record in reversed(records[random.randint(0, len(records)):]):
+                s.undo(record)
+            if not m.has_food():
+                m.create_food(random_empty(m))
+            assert field.field == solver.distance_field(m.food, use_numpy=False)
+        # The head isn't free, but it still has a distance to the food.
+        full = solver.distance_field(m.food, use_numpy=False)
+        expect = min([full[m.idx_of(adj)] + 1 for adj in s.head().all_adj() if full[m.idx_of(adj)] >= 0] or [-1])
+        assert field.distance(s.head()) == expect
+        m.reset()
+        assert field.distance(Pos(5, 5)) == -1  # No food, no distance.
@@ -0,0 +1,54 @@
+# coding=utf-8
+"""
+Tests for the snake that looks ahead.
+It should never walk into a dead end that it could have seen coming, not even for food,
+and it should leave the board the way it was.
+"""
+import random
+from unittest import TestCase
+
+from snake.map import Map, Snake, Direc, Pos, PointType
+from snake.solver import LookaheadSolver
+
+
+class TestLookaheadSolver(TestCase):
+    def test_dead_end(self):
+        m = Map(7, 7)
+        s = Snake(m, Direc.DOWN,
+                  [Pos(2, 3), Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_D, PointType.BODY_DL, PointType.BODY_HOR, PointType.BODY_HOR])
+        # A pocket to the right of the head, too small for the snake, with the food at the end of it.
+        for pos in (Pos(1, 5), Pos(3, 5), Pos(3, 4), Pos(4, 4), Pos(4, 5)):
+            m.point(pos).type = PointType.WALL
+        m.create_food(Pos(2, 5))
+        before = bytes(m.cells)
+        solver = LookaheadSolver(s, max_depth=4)
+        direc = solver.next_direc()
+        assert direc in (Direc.LEFT, Direc.DOWN)
+        assert bytes(m.cells) == before
+        assert solver.depth >= 1
+        assert solver.nodes > 0
+
+    def test_game(self):
+        random.seed(23)
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        solver = LookaheadSolver(s, max_depth=3)
+        for _ in range(300):
+            if not m.has_food():
+                m.create_rand_food()
+            if m.is_full():
+                break
+            direc = solver.next_direc()
+            assert m.is_safe(s.head().adj(direc))
+            s.move(direc)
+        assert not s.dead
+        assert s.len() > 10
+        assert solver.nodes_per_sec > 0
+        assert len(solver.cache) > 0
+        # No time at all. The first depth doesn't get done, but there's still a move.
+        if not m.is_full():
+            direc = solver.next_direc(0)
+            assert direc != Direc.NONE
@@ -23,3 +23,59 @@ class TestMap(TestCase):
                     assert m.point(Pos(i, j)).type == PointType.WALL
                 else:
                     assert m.point(Pos(i, j)).type == PointType.EMPTY
+
+    def test_flat_cells(self):
+        m = Map(6, 7)
+        pos = Pos(2, 3)
+        idx = m.idx_of(pos)
+        assert idx == 2 * 7 + 3
+        assert m.is_safe_idx(idx) and not m.is_safe_idx(0)
+        m.point(pos).type = PointType.BODY_HOR
+        # The point is just a view, so the change shows up in the buffer.
+        assert m.type_at_idx(idx) == PointType.BODY_HOR
+        assert not m.is_safe_idx(idx)
+        m.set_type_idx(idx, PointType.FOOD)
+        assert m.point(pos).type == PointType.FOOD
+        assert m.is_safe(pos)
+
+    def test_copy(self):
+        m = Map(6, 6)
+        m.create_food(Pos(2, 2))
+        m.point(Pos(1, 1)).type = PointType.HEAD_R
+        m_copy = m.copy()
+        assert m_copy.food == m.food
+        assert m_copy.cells == m.cells
+        m_copy.point(Pos(1, 1)).type = PointType.EMPTY
+        # Copies don't share their cells.
+        assert m.point(Pos(1, 1)).type == PointType.HEAD_R
+
+    def test_empty_index(self):
+        m = Map(5, 5)
+        assert m.num_empty == m.capacity and m.has_empty() and not m.is_full()
+        for i in range(1, 4):
+            for j in range(1, 4):
+                m.point(Pos(i, j)).type = PointType.BODY_HOR
+        assert m.num_empty == 0 and not m.has_empty() and m.is_full()
+        assert m.create_rand_food() is None
+        m.point(Pos(2, 2)).type = PointType.EMPTY
+        assert m.num_empty == 1 and not m.is_full()
+        assert m.create_rand_food() == Pos(2, 2)
+        assert m.num_empty == 0 and not m.is_full()
+        # Only one piece of food at a time.
+        assert m.create_rand_food() is None
+        m.rm_food()
+        assert m.num_empty == 1
+        m.reset()
+        assert m.num_empty == m.capacity
+
+    def test_neighbors(self):
+        m = Map(6, 8)
+        pos = Pos(2, 3)
+        idx = m.idx_of(pos)
+        assert m.pos_of(idx) == pos
+        for k, direc in enumerate(Map.ADJ_DIRECS):
+            adj = m.neighbors[idx][k]
+            assert m.pos_of(adj) == pos.adj(direc)
+            assert adj == m.neighbors[idx][direc.value - 1]
+            assert m.direc_between(idx, adj) == direc
+        assert m.neighbors[0][0] == -1 and m.neighbors[0][1] == -1
@@ -6,9 +6,46 @@ Second test tests if the find_path removing the tail momentarily works, so that
 It also tests to see if the longest path fills the whole map, which it should, given that either x or y are even.
 Some proofs online, but I can't really understand them.
 """
+import random
+import time
+from collections import deque
 from unittest import TestCase
+
 from snake.map import Direc, Pos, PointType, Map, Snake
 from snake.solver import PathSolver
+from tests import random_empty, check_path
+
+
+def _longest_by_insert(m, head, path):
+    """
+    The way longest_path_to used to push the path out, by inserting into the deque of directions,
+    kept around to check the spliced version against.
+    """
+    path = deque(path)
+    visited = {head}
+    cur = head
+    for direc in path:
+        cur = cur.adj(direc)
+        visited.add(cur)
+    idx, cur = 0, head
+    while idx < len(path):
+        cur_direc = path[idx]
+        nxt = cur.adj(cur_direc)
+        if cur_direc == Direc.LEFT or cur_direc == Direc.RIGHT:
+            tests = [Direc.UP, Direc.DOWN]
+        else:
+            tests = [Direc.LEFT, Direc.RIGHT]
+        for test_direc in tests:
+            cur_test, nxt_test = cur.adj(test_direc), nxt.adj(test_direc)
+            if cur_test not in visited and m.is_safe(cur_test) and nxt_test not in visited and m.is_safe(nxt_test):
+                visited.update((cur_test, nxt_test))
+                path.insert(idx, test_direc)
+                path.insert(idx + 2, Direc.opposite(test_direc))
+                break
+        else:
+            cur = nxt
+            idx += 1
+    return path
 
 
 class TestPathSolver(TestCase):
@@ -62,3 +99,236 @@ class TestPathSolver(TestCase):
         # Therefore, we pass the path finders through a function called path_to
         # to remove the 'tail' at that location so it can be evaluated.
         assert not solver.longest_path_to(s.tail())
+
+    def test_longest_path_splicing(self):
+        random.seed(14)
+        for _ in range(50):
+            m = Map(12, 12)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR])
+            for _ in range(20):
+                m.point(random_empty(m)).type = PointType.WALL
+            des = random_empty(m)
+            solver = PathSolver(s)
+            shortest = solver.shortest_path_to(des)
+            longest = solver.longest_path_to(des)
+            assert len(longest) >= len(shortest)
+            assert len(longest) % 2 == len(shortest) % 2  # Every splice adds exactly two steps.
+            # The spliced path has to be a simple path over safe cells that ends up on the destination.
+            cur, seen = s.head(), {s.head()}
+            for direc in longest:
+                cur = cur.adj(direc)
+                assert cur not in seen
+                assert m.is_safe(cur)
+                seen.add(cur)
+            if shortest:
+                assert cur == des
+            # Pushed out from the same shortest path, it's the very same path that the old deque version gets.
+            assert solver.longest_path_to(des, deque(shortest)) == _longest_by_insert(m, s.head(), shortest)
+
+    def test_can_reach(self):
+        random.seed(15)
+        for _ in range(100):
+            m = Map(8, 8)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR])
+            for _ in range(random.randint(0, 25)):
+                m.point(random_empty(m)).type = PointType.WALL
+            solver = PathSolver(s)
+            des = random_empty(m)
+            assert solver.can_reach(des) == bool(solver.path_to(des, 'shortest'))
+            assert solver.can_reach_tail() == (len(solver.longest_path_to_tail()) > 1)
+            # Walk the snake around a bit, so the tail isn't always right behind the head.
+            for _ in range(random.randint(0, 6)):
+                if not m.has_food():
+                    m.create_food(random_empty(m))
+                direcs = [d for d in (Direc.LEFT, Direc.UP, Direc.RIGHT, Direc.DOWN)
+                          if m.is_safe(s.head().adj(d))]
+                if not direcs:
+                    break
+                s.move(random.choice(direcs))
+            assert solver.can_reach_tail() == (len(solver.longest_path_to_tail()) > 1)
+
+    def test_deadline(self):
+        m = Map(50, 50)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        m.create_food(Pos(48, 48))
+        solver = PathSolver(s)
+        # The deadline has already passed, so the searches give up before getting anywhere.
+        solver.deadline = time.perf_counter()
+        assert not solver.path_to(m.food, 'shortest')
+        assert solver.timed_out
+        solver.deadline = time.perf_counter()
+        assert not solver.can_reach(Pos(24, 24))
+        assert solver.timed_out
+        # The longest path gives up pushing out, but what it has still gets to the tail.
+        solver.deadline = time.perf_counter()
+        path = solver.longest_path_to_tail()
+        assert solver.timed_out
+        assert 1 < len(path) < len(PathSolver(s).longest_path_to_tail())
+        # Without a deadline, everything is back to normal.
+        solver.deadline = None
+        assert not solver.timed_out
+        assert len(solver.path_to(m.food, 'shortest')) == 93
+        assert solver.can_reach(Pos(24, 24))
+        assert not solver.timed_out
+
+    def test_rooms_after(self):
+        random.seed(20)
+        for _ in range(50):
+            m = Map(9, 9)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+            for _ in range(random.randint(5, 20)):
+                m.point(random_empty(m)).type = PointType.WALL
+            solver = PathSolver(s)
+            tail = m.idx_of(s.tail())
+            cells = [m.pos_of(i) for i, c in enumerate(m.cells) if c == PointType.EMPTY.value]
+            limit = random.randint(1, 30)
+            rooms = solver.rooms_after(cells, limit)
+            for pos, room in zip(cells, rooms):
+                # Fill in the cell, then flood fill every piece next to it the slow way.
+                blocked, best = {m.idx_of(pos)}, 0
+                for start in m.neighbors[m.idx_of(pos)]:
+                    if start in blocked or not (start == tail or m.is_safe_idx(start)):
+                        continue
+                    blocked.add(start)
+                    stack, size = [start], 0
+                    while stack:
+                        size += 1
+                        for adj in m.neighbors[stack.pop()]:
+                            if adj not in blocked and (adj == tail or m.is_safe_idx(adj)):
+                                blocked.add(adj)
+                                stack.append(adj)
+                    best = max(best, size)
+                assert room == min(best, limit)
+
+    def test_paths_to_many(self):
+        random.seed(16)
+        for _ in range(50):
+            m = Map(10, 10)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 4), Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR, PointType.BODY_HOR])
+            for _ in range(random.randint(0, 30)):
+                m.point(random_empty(m)).type = PointType.WALL
+            m.create_food(random_empty(m))
+            solver = PathSolver(s)
+            targets = [m.food, s.tail(), random_empty(m), s.head()]
+            paths = solver.paths_to_many(targets)
+            assert len(paths) == len(targets)
+            assert not paths[-1]  # The head is already there.
+            for target, path in zip(targets[:-1], paths):
+                expect = solver.path_to(target, 'shortest')
+                assert len(path) == len(expect)
+                cur = s.head()
+                for direc in path:
+                    cur = cur.adj(direc)
+                if path:
+                    assert cur == target
+            # Pushing out the tail path that was found along the way is no different from searching for it.
+            assert len(solver.longest_path_to_tail(paths[1])) % 2 == len(paths[1]) % 2
+
+    def test_distance_field(self):
+        m = Map(8, 9)
+        m.create_food(Pos(6, 1))
+        s = Snake(m, Direc.DOWN,
+                  [Pos(3, 4), Pos(2, 4), Pos(1, 4), Pos(1, 3), Pos(1, 2)],
+                  [PointType.HEAD_D, PointType.BODY_VER, PointType.BODY_VER, PointType.BODY_HOR,
+                   PointType.BODY_HOR])
+        for i in range(1, 6):
+            m.point(Pos(4, i)).type = PointType.WALL
+        m.point(Pos(5, 7)).type = PointType.WALL
+        m.point(Pos(6, 6)).type = PointType.WALL
+        solver = PathSolver(s)
+        fields = [solver.distance_field(use_numpy=False)]
+        try:
+            import numpy
+            fields.append(solver.distance_field())
+            # NumPy is optional, but if it's there, both engines must agree.
+        except ImportError:
+            pass
+        for field in fields:
+            assert field[m.idx_of(s.head())] == 0
+            assert field[m.idx_of(Pos(6, 7))] == -1  # Walled off.
+            assert field[m.idx_of(Pos(0, 0))] == -1
+            for i in range(1, 7):
+                for j in range(1, 8):
+                    pos = Pos(i, j)
+                    if m.is_safe(pos):
+                        path = solver.path_to(pos, 'shortest')
+                        if path:
+                            assert field[m.idx_of(pos)] == len(path)
+                        else:
+                            assert field[m.idx_of(pos)] == -1
+        assert list(fields[0]) == list(fields[-1])
+
+    def test_astar(self):
+        random.seed(7)
+        for _ in range(20):
+            m = Map(12, 12)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(5, 3), Pos(5, 2), Pos(5, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+            for _ in range(30):
+                m.point(random_empty(m)).type = PointType.WALL
+            solver = PathSolver(s, 'astar')
+            for _ in range(5):
+                des = random_empty(m)
+                assert len(solver.path_to(des, 'astar')) == len(solver.path_to(des, 'shortest'))
+        # On an open map, A* goes straight for the target.
+        m = Map(22, 22)
+        s = Snake(m, Direc.RIGHT, [Pos(1, 2), Pos(1, 1)], [PointType.HEAD_R, PointType.BODY_HOR])
+        m.create_food(Pos(20, 20))
+        solver = PathSolver(s, 'astar')
+        path = solver.shortest_path_to_food()
+        assert len(path) == 37 and solver.expanded == 38
+        assert list(path) == [Direc.RIGHT] * 18 + [Direc.DOWN] * 19
+        solver.path_to(m.food, 'shortest')
+        assert solver.expanded > 300
+
+    def test_bidirectional(self):
+        random.seed(11)
+        for _ in range(20):
+            m = Map(12, 12)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(5, 3), Pos(5, 2), Pos(5, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+            for _ in range(40):
+                m.point(random_empty(m)).type = PointType.WALL
+            solver = PathSolver(s)
+            for des in [random_empty(m) for _ in range(5)] + [s.tail()]:
+                path = solver.path_to(des, 'bidirectional')
+                assert len(path) == len(solver.path_to(des, 'shortest'))
+                if path:
+                    check_path(m, s, des, path)
+
+    def test_jps(self):
+        random.seed(13)
+        for walls in [0, 10, 40]:
+            for _ in range(15):
+                m = Map(12, 13)
+                s = Snake(m, Direc.RIGHT,
+                          [Pos(5, 3), Pos(5, 2), Pos(5, 1)],
+                          [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+                for _ in range(walls):
+                    m.point(random_empty(m)).type = PointType.WALL
+                solver = PathSolver(s)
+                for des in [random_empty(m) for _ in range(5)] + [s.tail()]:
+                    path = solver.path_to(des, 'jps')
+                    assert len(path) == len(solver.path_to(des, 'shortest'))
+                    if path:
+                        check_path(m, s, des, path)
+        # The snake is short enough, so the food is found with jump point search.
+        m = Map(22, 22)
+        s = Snake(m, Direc.RIGHT, [Pos(1, 2), Pos(1, 1)], [PointType.HEAD_R, PointType.BODY_HOR])
+        m.create_food(Pos(20, 20))
+        solver = PathSolver(s)
+        assert len(solver.shortest_path_to_food()) == 37 and solver.expanded < 10
+        solver.jps_fraction = 0
+        assert len(solver.shortest_path_to_food()) == 37 and solver.expanded > 300
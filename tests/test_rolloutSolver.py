@@ -0,0 +1,108 @@
+# coding=utf-8
+"""
+Tests for the snake that plays the game forward a bunch of times before every move.
+It needs NumPy, so these are skipped without it.
+"""
+import random
+from unittest import TestCase, skipIf
+
+from snake.map import Map, Snake, Direc, Pos, PointType
+from snake.solver import RolloutSolver
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@skipIf(numpy is None, 'RolloutSolver needs NumPy.')
+class TestRolloutSolver(TestCase):
+    def test_dead_end(self):
+        m = Map(7, 7)
+        s = Snake(m, Direc.DOWN,
+                  [Pos(2, 3), Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_D, PointType.BODY_DL, PointType.BODY_HOR, PointType.BODY_HOR])
+        # A pocket to the right of the head, too small for the snake, with the food at the end of it.
+        for pos in (Pos(1, 5), Pos(3, 5), Pos(3, 4), Pos(4, 4), Pos(4, 5)):
+            m.point(pos).type = PointType.WALL
+        m.create_food(Pos(2, 5))
+        before = bytes(m.cells)
+        solver = RolloutSolver(s, num_rollouts=32, depth=10, seed=24)
+        direc = solver.next_direc()
+        assert direc in (Direc.LEFT, Direc.DOWN)
+        assert bytes(m.cells) == before
+        scores = solver.scores
+        assert set(scores) == {Direc.LEFT, Direc.RIGHT, Direc.DOWN}
+        # Every rollout into the pocket dies within four steps, food or no food.
+        assert scores[Direc.RIGHT] <= 4 + 10 / 4
+        assert scores[Direc.RIGHT] < scores[direc]
+        # Every rollout counts, however soon it dies, but only the steps that get played do.
+        score, completed, started, played = solver.score_move(Direc.RIGHT)
+        assert completed and started == 32 and played <= 4 * 32
+        score, completed, started, played = solver.score_move(Direc.LEFT, budget_ms=0)
+        assert not completed and started == 32 and played == 32
+
+    def test_game(self):
+        random.seed(24)
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        solver = RolloutSolver(s, num_rollouts=16, depth=20, seed=24)
+        for _ in range(200):
+            if not m.has_food():
+                m.create_rand_food()
+            if m.is_full():
+                break
+            direc = solver.next_direc()
+            assert m.is_safe(s.head().adj(direc))
+            s.move(direc)
+        assert not s.dead
+        assert s.len() > 10
+        assert 0 < solver.rollouts_per_sec < solver.steps_per_sec
+        assert solver.stats.ticks == 200
+
+    def test_pool(self):
+        random.seed(25)
+        m = Map(8, 8)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        solver = RolloutSolver(s, num_rollouts=16, depth=10, seed=25)
+        solver.start_pool(0, workers=2)
+        try:
+            for _ in range(10):
+                if not m.has_food():
+                    m.create_rand_food()
+                num_moves = sum(m.is_safe(adj) for adj in s.head().all_adj())
+                direc = solver.next_direc()
+                assert m.is_safe(s.head().adj(direc))
+                assert len(solver.scores) == (num_moves if num_moves > 1 else 0)
+                s.move(direc)
+        finally:
+            solver.close_pool()
+        assert solver.stats.phases['rollouts'][1] == 0
+
+    def test_pool_seed(self):
+        def play():
+            random.seed(26)
+            m = Map(8, 8)
+            s = Snake(m, Direc.RIGHT,
+                      [Pos(1, 2), Pos(1, 1)],
+                      [PointType.HEAD_R, PointType.BODY_HOR])
+            solver = RolloutSolver(s, num_rollouts=16, depth=10, seed=26)
+            solver.start_pool(0, workers=2)
+            scores = []
+            try:
+                for _ in range(10):
+                    if not m.has_food():
+                        m.create_rand_food()
+                    direc = solver.next_direc()
+                    scores.append(solver.scores)
+                    s.move(direc)
+            finally:
+                solver.close_pool()
+            return scores
+
+        # Same seed, same games, whichever worker played them.
+        assert play() == play()
@@ -7,6 +7,7 @@ Eating should halt tail destruction.
 Third test makes sure that copying the snake results in a different snake that has the same attribute values
 as original snake.
 Fourth test makes sure that killing the snake makes it dead.
+Turning right around into the neck kills it too, and apply can take that back like any other move.
 """
 from unittest import TestCase
 
@@ -202,3 +203,121 @@ class TestSnake(TestCase):
         assert not s.dead
         s.move(s.direc)
         assert s.dead and s.len() == 5 and s.head() == Pos(2, 1)
+
+    def test_reverse(self):
+        m = Map(5, 6)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        # Turning right around runs the head into the neck, which is just as deadly as anything else.
+        s.move(Direc.LEFT)
+        assert s.dead and s.len() == 3 and s.head() == Pos(1, 2)
+        assert m.point(Pos(1, 3)).type == PointType.BODY_HOR
+
+        m.reset()
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        cells, bodies = bytes(m.cells), list(s.bodies)
+        record = s.apply(Direc.LEFT)
+        assert s.dead and s.head() == Pos(1, 2)
+        s.undo(record)
+        assert not s.dead and s.direc == Direc.RIGHT
+        assert list(s.bodies) == bodies
+        assert bytes(m.cells) == cells
+
+    def test_apply_undo(self):
+        m = Map(6, 6)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        m.create_food(Pos(2, 3))
+        cells, food = bytes(m.cells), m.food
+        bodies = list(s.bodies)
+        # Eat, move on, then run into the wall.
+        records = [s.apply(direc) for direc in [Direc.DOWN, Direc.LEFT, Direc.LEFT, Direc.LEFT]]
+        assert s.dead and s.len() == 4 and s.steps == 4 and not m.has_food()
+        # A dead snake doesn't move, but the record can still be undone.
+        records.append(s.apply(Direc.UP))
+        for record in reversed(records):
+            s.undo(record)
+        assert not s.dead and s.steps == 0
+        assert s.direc == Direc.RIGHT and s.direc_next == Direc.NONE
+        assert list(s.bodies) == bodies
+        assert bytes(m.cells) == cells and m.food == food
+        assert m.num_empty == m.capacity - 4
+
+    def test_steps_until_vacated(self):
+        m = Map(6, 6)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        assert s.steps_until_vacated(Pos(1, 3)) == 3
+        assert s.steps_until_vacated(Pos(1, 1)) == 1
+        assert s.steps_until_vacated(Pos(2, 2)) == 0
+        s.move(Direc.DOWN)
+        s.move(Direc.LEFT)
+        assert s.steps_until_vacated(Pos(2, 2)) == 3
+        assert s.steps_until_vacated(Pos(2, 3)) == 2
+        assert s.steps_until_vacated(Pos(1, 3)) == 1
+        assert s.steps_until_vacated(Pos(1, 1)) == 0
+        s.move(Direc.LEFT)
+        s.move(Direc.UP)
+        # The head is back where the tail used to be.
+        assert s.steps_until_vacated(Pos(1, 1)) == 3
+        assert list(s.bodies) == [Pos(1, 1), Pos(2, 1), Pos(2, 2)]
+        assert s.bodies[-1] == s.tail()
+
+    def test_zobrist(self):
+        m = Map(6, 6)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR])
+        start = s.zobrist
+        m.create_food(Pos(3, 3))
+        with_food = s.zobrist
+        assert with_food != start
+        records = [s.apply(direc) for direc in [Direc.DOWN, Direc.DOWN, Direc.RIGHT]]
+        assert s.zobrist != with_food
+        for record in reversed(records):
+            s.undo(record)
+        assert s.zobrist == with_food
+        # Going around in a square brings back the same state.
+        s.move_path([Direc.DOWN, Direc.LEFT, Direc.UP, Direc.RIGHT])
+        lap = s.zobrist
+        s.move_path([Direc.DOWN, Direc.LEFT, Direc.UP])
+        assert s.zobrist != lap
+        s.move(Direc.RIGHT)
+        assert s.zobrist == lap
+        s_copy, m_copy = s.copy()
+        assert s_copy.zobrist == s.zobrist
+        m.rm_food()
+        m.reset()
+        assert m.zobrist == Map(6, 6).zobrist
+
+    def test_bytes(self):
+        m = Map(7, 7)
+        s = Snake(m, Direc.RIGHT,
+                  [Pos(1, 3), Pos(1, 2), Pos(1, 1)],
+                  [PointType.HEAD_R, PointType.BODY_HOR, PointType.BODY_HOR])
+        m.create_food(Pos(3, 3))
+        s.move_path([Direc.DOWN, Direc.DOWN, Direc.LEFT])
+        s.direc_next = Direc.UP
+        data = s.to_bytes()
+        s_copy, m_copy = Snake.from_bytes(data, restore_rng=True)
+        assert s_copy.steps == 3 and s_copy.len() == 4 and not s_copy.dead
+        assert s_copy.direc == Direc.LEFT and s_copy.direc_next == Direc.UP
+        assert list(s_copy.bodies) == list(s.bodies)
+        assert m_copy.cells == m.cells and m_copy.food == m.food
+        assert s_copy.zobrist == s.zobrist
+        assert s_copy.steps_until_vacated(Pos(1, 3)) == s.steps_until_vacated(Pos(1, 3)) == 1
+        assert s_copy.to_bytes() == data
+        # Both games carry on in exactly the same way, random food included.
+        food = m.create_rand_food()
+        random_state_after = s.to_bytes()
+        _ = Snake.from_bytes(data, restore_rng=True)
+        assert m_copy.create_rand_food() == food
+        s.move(Direc.UP)
+        s_copy.move(Direc.UP)
+        assert s_copy.to_bytes() == s.to_bytes() != random_state_after
+        assert len(s.to_bytes(with_rng=False)) < len(data)